@@ -15,6 +15,7 @@ setuptools.setup(
     package_dir={"": "src"},
     #packages=setuptools.find_packages(where='src'),
     packages=["sigmapie"],
+    extras_require={"numpy": ["numpy"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: GNU General Public License v3 or later (GPLv3+)",
@@ -6,6 +6,8 @@ Free Software Foundation; either version 3 of the License, or (at your
 option) any later version.
 """
 
+from sigmapie.grammar import Complement
+
 
 class FSM(object):
     """This class implements Finite State Machine.
@@ -14,7 +16,19 @@ class FSM(object):
         initial (str): initial symbol;
         final (str): final symbol;
         transitions (list): triples of the form [prev_state,
-            transition, next_state].
+            transition, next_state];
+        source (list or Complement): SL grammar the transitions are
+            derived from, if they were built by `sl_to_fsm`;
+        table (dict): compiled SL transitions of the form
+            {prev_state: {symbols that can be read}}, built on demand
+            and reset every time the transitions are replaced;
+        k (int): window size of the compiled SL transitions;
+        index (dict): the transitions indexed by their source state and
+            symbol, {(prev_state, transition): transition triple}, built
+            for SP templates and reset every time the transitions are
+            replaced;
+        maps (dict): state maps built by `state_map`, reset every time
+            the transitions are replaced.
     """
 
     def __init__(self, initial, final, transitions=None):
@@ -26,17 +40,78 @@ class FSM(object):
         self.initial = initial
         self.final = final
 
+    @property
+    def transitions(self):
+        """The list of transitions of the automaton. If the automaton was
+        built from a grammar, the list is only created when it is first
+        accessed."""
+        if self._transitions is None:
+            self._transitions = [(i[:-1], i[-1], i[1:]) for i in self.source]
+        return self._transitions
+
+    @transitions.setter
+    def transitions(self, value):
+        self._transitions = value
+        self.source = None
+        self.table = None
+        self.k = None
+        self.index = None
+        self.maps = {}
+
     def sl_to_fsm(self, grammar):
         """Creates FSM transitions based on the SL grammar.
 
         Arguments:
-            grammar (list): SL ngrams.
+            grammar (list or Complement): SL ngrams; a `Complement`
+                is not expanded into the list of transitions unless
+                the transitions are accessed.
         """
         '''
         if not grammar:
             raise ValueError("The grammar must not be empty.")
             '''# # This part was commented out to work with MITSL
-        self.transitions = [(i[:-1], i[-1], i[1:]) for i in grammar]
+        self.transitions = None
+        self.source = grammar
+        self.compile_sl()
+
+    def state_map(self, symbols):
+        """Lists the symbols that can be read from every state made of the
+        given symbols. The transitions are read once, and the map is
+        kept until they are replaced.
+
+        Arguments:
+            symbols (iterable): symbols the states can be made of.
+        Returns:
+            dict: the dictionary of the form
+                {(k-1)-long tuple of symbols: [list of next symbols]}.
+        """
+        key = frozenset(symbols)
+        if key not in self.maps:
+            smap = {}
+            for state, symbol, _ in self.transitions:
+                if all(i in key for i in state):
+                    smap.setdefault(tuple(state), []).append(symbol)
+            self.maps[key] = smap
+        return self.maps[key]
+
+    def compile_sl(self):
+        """Compiles SL transitions into a hash-indexed table that maps
+        every (k-1)-long state to the set of symbols that can be read
+        from it, and saves it in the table attribute.
+
+        A `Complement` grammar answers such lookups itself, so it is
+        used as the table directly.
+        """
+        if isinstance(self.source, Complement):
+            self.table = self.source
+            self.k = self.source.k
+            return
+
+        table = {}
+        for state, symbol, _ in self.transitions:
+            table.setdefault(tuple(state), set()).add(symbol)
+        self.table = table
+        self.k = len(self.transitions[0][0]) + 1 if self.transitions else None
 
     def scan_sl(self, string):
         """Scans a given string using the learned SL grammar.
@@ -48,21 +123,19 @@ class FSM(object):
         """
         if string[0] != self.initial or string[-1] != self.final:
             raise ValueError("The string is not annotated with " "the delimeters.")
-        if not self.transitions:
+        if not (self.transitions if self.source is None else self.source):
             raise ValueError(
                 "The transitions are empty. Extract the"
                 " transitions using grammar.fsmize()."
             )
 
-        k = len(self.transitions[0][0]) + 1
-        for i in range(k - 1, len(string)):
-            move_to_next = []
-            for j in self.transitions:
-                # #can_read = string[(i - k + 1) : (i + 1)] == "".join(j[0]) + j[1]
-                can_read = list(string[(i - k + 1) : (i + 1)]) == list(j[0]) + [j[1]]# #The above line was modified for compatibility with MITSL
-                move_to_next.append(can_read)
+        if self.table is None:
+            self.compile_sl()
 
-            if not any(move_to_next):
+        # the string can be either a str or a tuple of symbols (MITSL)
+        k = self.k
+        for i in range(k - 1, len(string)):
+            if string[i] not in self.table.get(tuple(string[(i - k + 1) : i]), ()):
                 return False
 
         return True
@@ -84,42 +157,47 @@ class FSM(object):
         self.transitions = [(i[2], i[1], i[0]) for i in mirrored]
 
     def accessible_states(self, marker):
-        """Finds accessible states.
+        """Finds accessible states by a depth-first search over the
+        transitions indexed by the state they start from, so every
+        transition is only looked at once.
 
         Arguments:
             marker (str): initial or final state.
         Returns:
             list: list of transitions that can be made from
-                the given initial or final state.
+                the given initial or final state, in their original
+                order.
         """
-        updated = self.transitions[:]
-
-        # find initial/final transitions
-        reachable = []
+        # index the transitions by the state they start from
+        outgoing = {}
         for i in self.transitions:
-            if i[0][0] == i[0][-1] == marker:
-                reachable.append(i)
-                updated.remove(i)
-
-        # to keep copies that can be modified while looping
-        mod_updated = updated[:]
-        mod_reachable = []
-        first_time = True
-
-        # find transitions that can be reached
-        while mod_reachable != [] or first_time:
-            mod_reachable = []
-            first_time = False
-            for p in updated:
-                for s in reachable:
-                    if p[0] == s[2]:
-                        mod_reachable.append(p)
-                        mod_updated.remove(p)
-            updated = mod_updated[:]
-            reachable.extend(mod_reachable)
+            outgoing.setdefault(i[0], []).append(i)
+
+        # find the states of initial/final transitions
+        reached = {i[0] for i in self.transitions if i[0][0] == i[0][-1] == marker}
+        queue = list(reached)
+
+        # visit every state that can be reached from them only once
+        while queue:
+            state = queue.pop()
+            for i in outgoing[state]:
+                if i[2] not in reached and i[2] in outgoing:
+                    reached.add(i[2])
+                    queue.append(i[2])
+
+        reachable = [i for i in self.transitions if i[0] in reached]
 
         return reachable
 
+    def index_transitions(self):
+        """Indexes the transitions by their source state and symbol, and
+        saves the index in the index attribute. If several transitions
+        share the state and the symbol, the first one is kept."""
+        index = {}
+        for t in self.transitions:
+            index.setdefault((t[0], t[1]), t)
+        self.index = index
+
     def sp_build_template(self, path, alphabet, k):
         """Generates a template for the given k-SP path.
 
@@ -148,6 +226,7 @@ class FSM(object):
             )
 
         self.transitions += newtrans
+        self.index_transitions()
 
     def sp_fill_template(self, sequence):
         """Runs the imput sequence through the SP automaton and marks
@@ -159,17 +238,20 @@ class FSM(object):
             sequence (str): sequence of symbols that needs to be
                 passed through the automaton.
         """
+        if self.index is None:
+            self.index_transitions()
+
         state = 0
         for s in sequence:
-            for t in self.transitions:
-                if (t[0] == state) and (t[1] == s):
-                    state = t[2]
-                    t[3] = True
-                    break
+            t = self.index.get((state, s))
+            if t is not None:
+                state = t[2]
+                t[3] = True
 
     def sp_clean_template(self):
         """Removes transitions that were not accessed."""
         self.transitions = [i[:3] for i in self.transitions if i[3] == True]
+        self.index_transitions()
 
     def scan_sp(self, string):
         """Runs the given sequence through the automaton.
@@ -180,16 +262,280 @@ class FSM(object):
             bool: True if input can be accepted by the automaton,
                 otherwise False.
         """
+        if self.index is None:
+            self.index_transitions()
+
         state = 0
         for s in string:
-            change = False
-            for t in self.transitions:
-                if (t[0] == state) and (t[1] == s):
-                    state = t[2]
-                    change = True
-                    break
-
-            if not change:
+            t = self.index.get((state, s))
+            if t is None:
                 return False
+            state = t[2]
+
+        return True
+
+
+class CompiledFSM(object):
+    """This class implements a deterministic automaton that is compiled
+    on demand: its states and transitions are only created when they are
+    first reached, and every transition is then a single dictionary lookup.
+
+    Attributes:
+        step (function): computes the next state from a state and a
+            symbol, returns None if the symbol cannot be read;
+        final (function): tells if the input can end in a state, every
+            state is final if None;
+        states (list): hashable states reached so far, the initial one
+            first; states are referred to by their position in the list;
+        ids (dict): the dictionary of the form {state: its position};
+        transitions (dict): the dictionary of the form
+            {(state id, symbol): next state id or None}.
+    """
+
+    def __init__(self, initial, step, final=None):
+        self.step = step
+        self.final = final
+        self.states = [initial]
+        self.ids = {initial: 0}
+        self.transitions = {}
+        self.finals = {}
 
+    def move(self, state, symbol):
+        """Reads the symbol from the given state.
+
+        Arguments:
+            state (int): id of the current state;
+            symbol (str): the symbol to be read.
+        Returns:
+            int: id of the next state, None if the symbol cannot be read.
+        """
+        key = (state, symbol)
+        if key not in self.transitions:
+            new = self.step(self.states[state], symbol)
+            if new is not None and new not in self.ids:
+                self.ids[new] = len(self.states)
+                self.states.append(new)
+            self.transitions[key] = None if new is None else self.ids[new]
+        return self.transitions[key]
+
+    def scan(self, string):
+        """Runs the given sequence through the automaton.
+
+        Arguments:
+            string (str): string to run through the automaton.
+        Returns:
+            bool: True if input can be read by the automaton,
+                otherwise False.
+        """
+        state = 0
+        for s in string:
+            state = self.move(state, s)
+            if state is None:
+                return False
         return True
+
+    def is_final(self, state):
+        """Tells if the input can end in the given state.
+
+        Arguments:
+            state (int): id of the state.
+        Returns:
+            bool: True if the state is final.
+        """
+        if state not in self.finals:
+            self.finals[state] = self.final is None or self.final(self.states[state])
+        return self.finals[state]
+
+    def explore(self, alphabet, depth=None):
+        """Finds the states that can be reached from the initial one.
+
+        Arguments:
+            alphabet (list): symbols that can be read;
+            depth (int): the longest strings to read, there is no limit
+                if None.
+        Returns:
+            list: ids of the reached states.
+        """
+        seen = {0}
+        frontier = [0]
+        length = 0
+        while frontier and (depth is None or length < depth):
+            following = []
+            for state in frontier:
+                for s in alphabet:
+                    new = self.move(state, s)
+                    if new is not None and new not in seen:
+                        seen.add(new)
+                        following.append(new)
+            frontier = following
+            length += 1
+        return sorted(seen)
+
+    def distances(self, alphabet, states):
+        """Finds how many symbols are needed to get from every given state
+        to a final state, going through the given states only.
+
+        Arguments:
+            alphabet (list): symbols that can be read;
+            states (list): ids of the states, see `explore`.
+        Returns:
+            dict: the dictionary of the form {state id: distance}, the
+                states from which no final state can be reached are
+                omitted.
+        """
+        states = set(states)
+        incoming = {}
+        for state in states:
+            for s in alphabet:
+                new = self.transitions.get((state, s))
+                if new in states:
+                    incoming.setdefault(new, []).append(state)
+
+        distance = {i: 0 for i in sorted(states) if self.is_final(i)}
+        frontier = list(distance)
+        while frontier:
+            following = []
+            for state in frontier:
+                for prev in incoming.get(state, []):
+                    if prev not in distance:
+                        distance[prev] = distance[state] + 1
+                        following.append(prev)
+            frontier = following
+        return distance
+
+    def is_live(self, state, alphabet, known):
+        """Tells if a final state can be reached from the given state. The
+        states are searched breadth-first, only until a final state or
+        a state known to be live is found.
+
+        Arguments:
+            state (int): id of the state;
+            alphabet (list): symbols that can be read;
+            known (dict): the states already tested, {state id: bool},
+                updated with the result.
+        Returns:
+            bool: True if a final state can be reached.
+        """
+        if state in known:
+            return known[state]
+        seen = {state}
+        frontier = [state]
+        while frontier:
+            following = []
+            for i in frontier:
+                if known.get(i) or self.is_final(i):
+                    known[state] = True
+                    return True
+                if i in known:
+                    continue
+                for s in alphabet:
+                    new = self.move(i, s)
+                    if new is not None and new not in seen:
+                        seen.add(new)
+                        following.append(new)
+            frontier = following
+        # nothing reachable from the seen states is final
+        for i in seen:
+            known[i] = False
+        return False
+
+    def enumerate(self, alphabet, max_length=None):
+        """Lists the strings accepted by the automaton, shortest first,
+        and strings of the same length in the order of the alphabet.
+        Prefixes that cannot be completed (within the length limit) are
+        not extended. Without a limit, the states are only explored as
+        far as needed to tell if the prefixes can be completed, see
+        `is_live`.
+
+        Arguments:
+            alphabet (list): symbols that can be read;
+            max_length (int): the longest strings to list, there is no
+                limit if None.
+        Yields:
+            str: the accepted strings.
+        """
+        if max_length is None:
+            known = {}
+
+            def extend(state, length):
+                return self.is_live(state, alphabet, known)
+
+        else:
+            distance = self.distances(alphabet, self.explore(alphabet, max_length))
+
+            def extend(state, length):
+                return state in distance and length + distance[state] <= max_length
+
+        frontier = [(0, "")] if extend(0, 0) else []
+        length = 0
+        while frontier:
+            following = []
+            for state, string in frontier:
+                if self.is_final(state):
+                    yield string
+                for s in alphabet:
+                    new = self.move(state, s)
+                    if new is not None and extend(new, length + 1):
+                        following.append((new, string + s))
+            frontier = following
+            length += 1
+
+    def count_paths(self, alphabet, length):
+        """Counts the accepted strings of every length up to the given one
+        that can be read from the states reached within that length.
+
+        Arguments:
+            alphabet (list): symbols that can be read;
+            length (int): the length of the longest strings.
+        Returns:
+            list: for every length r, the dictionary of the form
+                {state id: number of accepted strings of length r
+                read from that state}, states with no such strings
+                are omitted.
+        """
+        states = self.explore(alphabet, length)
+        counts = [{i: 1 for i in states if self.is_final(i)}]
+        for r in range(1, length + 1):
+            previous = counts[-1]
+            current = {}
+            for state in states:
+                total = 0
+                for s in alphabet:
+                    total += previous.get(self.transitions.get((state, s)), 0)
+                if total:
+                    current[state] = total
+            counts.append(current)
+        return counts
+
+    def sample(self, alphabet, length, n, rng):
+        """Draws accepted strings of the given length, uniformly among all
+        of them: every symbol is chosen with the probability proportional
+        to the number of accepted strings that start with it.
+
+        Arguments:
+            alphabet (list): symbols that can be read;
+            length (int): the length of the strings;
+            n (int): the number of strings to be drawn;
+            rng (random.Random): the random number generator.
+        Returns:
+            list: the drawn strings, or an empty list if no string of
+                that length is accepted.
+        """
+        counts = self.count_paths(alphabet, length)
+        total = counts[length].get(0, 0)
+        if not total:
+            return []
+
+        sample = []
+        for i in range(n):
+            state, string = 0, ""
+            for r in range(length, 0, -1):
+                x = rng.randrange(counts[r][state])
+                for s in alphabet:
+                    new = self.transitions.get((state, s))
+                    x -= counts[r - 1].get(new, 0)
+                    if x < 0:
+                        state, string = new, string + s
+                        break
+            sample.append(string)
+        return sample
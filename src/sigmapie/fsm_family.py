@@ -17,6 +17,9 @@ class FSMFamily(object):
     Attributes:
       transitions(list): triples of the form 
         [prev_state, transition, next_state].
+      compiled(CompiledFSM): a single automaton equivalent to the
+        whole family, if it was compiled; it is used instead of
+        the family when present.
     """
 
     def __init__(self, family=None):
@@ -25,6 +28,7 @@ class FSMFamily(object):
             self.family = []
         else:
             self.family = family
+        self.compiled = None
 
     def run_all_fsm(self, string):
         """Tells whether the given string is accepted by all the automata of
@@ -36,4 +40,6 @@ class FSMFamily(object):
             bool: True if the string is accepted by all the
                 fsms, otherwise False.
         """
-        return all([f.scan_sp(string) for f in self.family])
+        if self.compiled is not None:
+            return self.compiled.scan(string)
+        return all(f.scan_sp(string) for f in self.family)
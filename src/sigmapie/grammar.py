@@ -7,9 +7,178 @@ Free Software Foundation; either version 3 of the License, or (at your
 option) any later version.
 """
 
-from itertools import product
+from itertools import product, islice
+from random import Random
+from collections import OrderedDict
 from sigmapie.helper import *
 
+# largest number of bits a grammar can be indexed with, see L.grammar_index
+MAX_BITSET_SIZE = 2 ** 27
+
+
+class SymbolTable(object):
+    """A table that interns symbols of a grammar as small integers, so that
+    n-grams can be stored as packed integers: an n-gram is read as a number
+    written in base |symbols|, its digits being the codes of its symbols.
+    Packed codes are only comparable between n-grams of the same length.
+
+    Attributes:
+        symbols (list): interned symbols, in the order of their codes;
+        index (dict): the mapping {symbol: code}.
+    """
+
+    def __init__(self, symbols):
+        """Initializes the SymbolTable object."""
+        self.symbols = []
+        self.index = {}
+        for s in symbols:
+            if s not in self.index:
+                self.index[s] = len(self.symbols)
+                self.symbols.append(s)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def encode(self, ngram):
+        """Packs the given ngram into an integer.
+
+        Arguments:
+            ngram (tuple): the ngram that needs to be packed.
+        Returns:
+            int: the packed ngram, or None if it contains a symbol
+                that is not in the table.
+        """
+        base = len(self.symbols)
+        code = 0
+        for s in ngram:
+            i = self.index.get(s)
+            if i is None:
+                return None
+            code = code * base + i
+        return code
+
+    def decode(self, code, k):
+        """Unpacks the integer into an ngram.
+
+        Arguments:
+            code (int): the packed ngram;
+            k (int): length of the ngram.
+        Returns:
+            tuple: the ngram.
+        """
+        base = len(self.symbols)
+        ngram = []
+        for i in range(k):
+            code, digit = divmod(code, base)
+            ngram.append(self.symbols[digit])
+        return tuple(reversed(ngram))
+
+    def encode_all(self, ngrams):
+        """Packs the given ngrams, skipping the ones that contain symbols
+        that are not in the table.
+
+        Arguments:
+            ngrams (list): the ngrams that need to be packed.
+        Returns:
+            set: packed ngrams.
+        """
+        codes = set()
+        for ngram in ngrams:
+            code = self.encode(ngram)
+            if code is not None:
+                codes.add(code)
+        return codes
+
+
+class NgramSet(object):
+    """A compact set of ngrams of the same length. Every ngram is ranked by
+    packing it with a `SymbolTable`, and the set stores one bit per
+    possible rank, so membership is a single bit test.
+
+    Attributes:
+        table (SymbolTable): symbols the ngrams are built from;
+        k (int): length of the ngrams;
+        bits (bytearray): membership bits indexed by the rank.
+    """
+
+    def __init__(self, table, k, ngrams=()):
+        """Initializes the NgramSet object."""
+        self.table = table
+        self.k = k
+        self.bits = bytearray((len(table) ** k + 7) // 8)
+        self.size = 0
+        self.update(ngrams)
+
+    def rank(self, ngram):
+        """Returns the rank of the ngram, or None if it cannot be stored."""
+        if len(ngram) != self.k:
+            return None
+        return self.table.encode(ngram)
+
+    def add(self, ngram):
+        """Adds the ngram to the set."""
+        code = self.rank(ngram)
+        if code is None:
+            raise ValueError(
+                "The ngram " + str(ngram) + " is not a " + str(self.k) + "-gram"
+                " over the symbols of the set."
+            )
+        byte, bit = code >> 3, 1 << (code & 7)
+        if not self.bits[byte] & bit:
+            self.bits[byte] |= bit
+            self.size += 1
+
+    def discard(self, ngram):
+        """Removes the ngram from the set if it is present."""
+        code = self.rank(ngram)
+        if code is None:
+            return
+        byte, bit = code >> 3, 1 << (code & 7)
+        if self.bits[byte] & bit:
+            self.bits[byte] &= ~bit
+            self.size -= 1
+
+    def update(self, ngrams):
+        """Adds all the given ngrams to the set."""
+        for ngram in ngrams:
+            self.add(ngram)
+
+    def copy(self):
+        """Returns a copy of the set."""
+        new = NgramSet(self.table, self.k)
+        new.bits = bytearray(self.bits)
+        new.size = self.size
+        return new
+
+    def __contains__(self, ngram):
+        code = self.rank(ngram)
+        return code is not None and bool(self.bits[code >> 3] & (1 << (code & 7)))
+
+    def __iter__(self):
+        for i, byte in enumerate(self.bits):
+            if byte:
+                for b in range(8):
+                    if byte & (1 << b):
+                        yield self.table.decode((i << 3) | b, self.k)
+
+    def __len__(self):
+        return self.size
+
+    def __eq__(self, other):
+        if isinstance(other, NgramSet) and other.k == self.k:
+            if other.table.symbols == self.table.symbols:
+                return other.bits == self.bits
+        try:
+            return set(self) == set(other)
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return "NgramSet(" + repr(list(self)) + ")"
+
 
 class L(object):
     """A general class for grammars and languages.
@@ -22,7 +191,10 @@ class L(object):
         k (int): locality window;
         data (list): input data;
         edges (list): start- and end-symbols for the grammar;
-        polar ("p" or "n"): polarity of the grammar.
+        polar ("p" or "n"): polarity of the grammar;
+        projection_cache (OrderedDict): recently computed tier images,
+            {(tier, string): image}, or None if they are not cached
+            (see `cache_projections`).
     """
 
     def __init__(
@@ -35,11 +207,149 @@ class L(object):
                 "positive ('p') or negative ('n')."
             )
         self.__polarity = polar
+        self._cache = {}
         self.alphabet = alphabet
         self.grammar = [] if grammar is None else grammar
         self.k = k
         self.data = [] if data is None else data
         self.edges = edges
+        self._projections = {}
+        self.projection_cache = None
+        self.projection_cache_size = 0
+
+    @property
+    def alphabet(self):
+        return self._alphabet
+
+    @alphabet.setter
+    def alphabet(self, value):
+        self._alphabet = value
+        self.invalidate()
+
+    @property
+    def grammar(self):
+        return self._grammar
+
+    @grammar.setter
+    def grammar(self, value):
+        self._grammar = value
+        self.invalidate()
+
+    @property
+    def edges(self):
+        return self._edges
+
+    @edges.setter
+    def edges(self, value):
+        self._edges = value
+        self.invalidate()
+
+    def invalidate(self):
+        """Forgets the structures computed from the grammar, see `_cached`.
+        It is called when the alphabet, the grammar, the tier or the
+        edges are replaced, and needs to be called after they are
+        edited in place.
+        """
+        self._cache.clear()
+
+    def _cached(self, name, build, *deps):
+        """Returns the value computed by `build`, memoized on the object
+        until `invalidate` is called.
+
+        The value is also recomputed if any of `deps` changed: strings,
+        numbers and tuples are compared by equality, other values by
+        identity, so editing a list in place is only noticed after
+        `invalidate`.
+        Arguments:
+            name (str): name of the memoized value;
+            build (callable): function computing the value;
+            *deps: values the memoized value depends on.
+        Returns:
+            the memoized value.
+        """
+        key = tuple(
+            d if d is None or isinstance(d, (str, int, float, tuple)) else id(d)
+            for d in deps
+        )
+        if name in self._cache:
+            old_key, _, value = self._cache[name]
+            if old_key == key:
+                return value
+        value = build()
+        # dependencies are stored so that their ids cannot be reused
+        self._cache[name] = (key, deps, value)
+        return value
+
+    def tier_projection(self, string, tier):
+        """Returns the image of the string on the tier, i.e. the string
+        without the symbols that are not on the tier. The symbols of
+        a string are deleted by `str.translate` with a table kept for
+        every tier; other sequences of symbols are filtered one by one.
+
+        Arguments:
+            string (str, list or tuple): string that needs to be projected;
+            tier (list): symbols of the tier.
+        Returns:
+            str: tier image of the string.
+        """
+        tier = tuple(tier)
+        if not isinstance(string, str):
+            return "".join(i for i in string if i in tier)
+
+        cache = self.projection_cache
+        if cache is not None:
+            key = (tier, string)
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+
+        table = self._projections.get(tier)
+        if table is None:
+            table = self._projections[tier] = TierProjection(tier)
+        image = string.translate(table)
+
+        if cache is not None:
+            cache[key] = image
+            if len(cache) > self.projection_cache_size:
+                cache.popitem(last=False)
+        return image
+
+    def cache_projections(self, size=100000):
+        """Keeps the most recently computed tier images, see
+        `tier_projection`.
+
+        Arguments:
+            size (int): the number of images to keep; the cache is
+                turned off if it is 0 or None.
+        """
+        if size:
+            self.projection_cache = OrderedDict()
+            self.projection_cache_size = size
+        else:
+            self.projection_cache = None
+            self.projection_cache_size = 0
+
+    def symbol_table(self, symbols=None, addEdges=True):
+        """Returns the table interning the given symbols (by default, the
+        alphabet) and the edge symbols as integers.
+
+        Arguments:
+            symbols (list) (optional): symbols that need to be interned;
+            addEdges (boolean) (optional): whether the edge symbols
+                should be interned as well.
+        Returns:
+            SymbolTable: the symbol table.
+        """
+        if symbols is None:
+            symbols = [] if self.alphabet is None else self.alphabet
+
+        def build():
+            local = list(symbols)
+            if addEdges:
+                local += [e for e in self.edges if e not in local]
+            return SymbolTable(local)
+
+        return self._cached("symbol_table", build, symbols, self.edges, addEdges)
 
     def extract_alphabet(self):
         """Extracts alphabet from the given data or grammar and saves it into
@@ -60,6 +370,36 @@ class L(object):
         symbols = symbols - set(self.edges)
         self.alphabet = sorted(list(symbols))
 
+    def grammar_index(self, symbols, addEdges=True, grammar=None):
+        """Returns the grammar as a container with constant-time membership,
+        memoized on the object: a `NgramSet` when the bit array is small
+        enough, otherwise a set of ngrams. Complements are returned as
+        they are, since they answer membership themselves.
+
+        Arguments:
+            symbols (list): symbols the ngrams are built from;
+            addEdges (boolean) (optional): whether the edge symbols
+                are used in the ngrams;
+            grammar (list) (optional): ngrams that need to be indexed,
+                the grammar attribute by default.
+        Returns:
+            NgramSet, set or Complement: the indexed grammar.
+        """
+        grammar = self.grammar if grammar is None else grammar
+        if isinstance(grammar, Complement):
+            return grammar
+
+        def build():
+            table = self.symbol_table(symbols, addEdges)
+            if len(table) ** self.k > MAX_BITSET_SIZE:
+                return set(tuple(i) for i in grammar)
+            index = NgramSet(table, self.k)
+            index.update(i for i in grammar if index.rank(i) is not None)
+            return index
+
+        name = ("grammar_index", tuple(symbols), addEdges)
+        return self._cached(name, build, grammar, self.edges, self.k)
+
     def well_formed_ngram(self, ngram):
         """Tells if the given ngram is well-formed. An ngram is ill-formed if:
 
@@ -103,9 +443,64 @@ class L(object):
 
         return True
 
+    def ngram_shapes(self, symbols, k, addEdges=True):
+        """Describes the shapes of well-formed ngrams of the length k: every
+        well-formed ngram is a run of start symbols, followed by a run of
+        non-edge symbols, followed by a run of end symbols.
+
+        Arguments:
+            symbols (list): alphabet;
+            k (int): locality window (length of ngram);
+            addEdges (boolean) (optional): whether the edge symbols
+                should be added to the alphabet.
+        Returns:
+            (list, list)
+                list: non-edge symbols, without repetitions;
+                list: (start, end) pairs giving the lengths of the
+                    runs of start and end symbols.
+        """
+        symb = symbols[:]
+        if addEdges:
+            if not ((self.edges[0] in symb) or (self.edges[1] in symb)):
+                symb += self.edges
+
+        inner, seen = [], set()
+        for s in symb:
+            if s not in self.edges and s not in seen:
+                seen.add(s)
+                inner.append(s)
+
+        max_start = k - 1 if self.edges[0] in symb else 0
+        max_end = k - 1 if self.edges[1] in symb else 0
+        shapes = []
+        for start in range(max_start + 1):
+            for end in range(min(max_end, k - start) + 1):
+                # an ngram without non-edge symbols needs both edges
+                if start + end == k and not (start and end):
+                    continue
+                shapes.append((start, end))
+
+        return inner, shapes
+
+    def count_all_ngrams(self, symbols, k, addEdges=True):
+        """Counts well-formed ngrams of the length k without generating them.
+
+        Arguments:
+            symbols (list): alphabet;
+            k (int): locality window (length of ngram);
+            addEdges (boolean) (optional): whether the edge symbols
+                should be added to the alphabet.
+        Returns:
+            int: the number of well-formed ngrams.
+        """
+        inner, shapes = self.ngram_shapes(symbols, k, addEdges)
+        return sum(len(inner) ** (k - start - end) for start, end in shapes)
+
     def generate_all_ngrams(self, symbols, k, addEdges=True, printProgressBar=False):
-        """Generates all possible ngrams of the length k based on the given
-        alphabet.
+        """Generates all well-formed ngrams of the length k based on the given
+        alphabet. The ngrams are constructed directly from their shapes
+        (see `ngram_shapes`) one by one, so ill-formed ngrams are never
+        built and the full list is never kept in memory.
 
         Arguments:
             alphabet (list): alphabet;
@@ -113,24 +508,22 @@ class L(object):
             addEdges (boolean) (optional): whether the edge character should be included. This was added as an option for MITSL, which should use multiple edge symbols instead of just a single edge character, so it handles this differently
             printProgressBar (boolean) (optional): whether a progressBar should be printed
         Returns:
-            list: generated ngrams.
+            generator: generated ngrams.
         """
-        symb = symbols[:]
-        if addEdges:
-            if not ((self.edges[0] in symb) or (self.edges[1] in symb)):
-                symb += self.edges
+        inner, shapes = self.ngram_shapes(symbols, k, addEdges)
 
-        combinations = product(symb, repeat=k)
-        ngrams = set()
+        def ngrams():
+            for start, end in shapes:
+                before = (self.edges[0],) * start
+                after = (self.edges[1],) * end
+                for middle in product(inner, repeat=k - start - end):
+                    yield before + middle + after
 
         if printProgressBar:#I don't always want to do this, since this one gets called a lot, so making this optional
-            combinations = progressBar([i for i in combinations], prefix = "generating ngrams")
-
-        for ngram in combinations:
-            if self.well_formed_ngram(ngram) and (ngram not in ngrams):
-                ngrams.add(ngram)
+            total = sum(len(inner) ** (k - start - end) for start, end in shapes)
+            return progressBar(ngrams(), prefix = "generating ngrams", total = total)
 
-        return list(ngrams)
+        return ngrams()
 
     def opposite_polarity(self, symbols):
         """Returns the grammar opposite to the one given.
@@ -140,10 +533,32 @@ class L(object):
         Returns:
             list: ngrams of the opposite polarity.
         """
-        all_ngrams = self.generate_all_ngrams(symbols, self.k)
-        opposite = [i for i in all_ngrams if i not in self.grammar]
+        return list(self.complement(symbols))
 
-        return opposite
+    def complement(self, symbols, addEdges=True, grammar=None):
+        """Returns a virtual grammar opposite to the one given, that does
+        not store the opposite ngrams. The complement of a complement
+        over the same alphabet is the original grammar.
+
+        Arguments:
+            symbols (list): alphabet;
+            addEdges (boolean) (optional): whether the edge symbols
+                should be added to the alphabet;
+            grammar (list) (optional): ngrams that need to be
+                complemented, the grammar attribute by default.
+        Returns:
+            Complement or list: ngrams of the opposite polarity.
+        """
+        g = self.grammar if grammar is None else grammar
+        if (
+            isinstance(g, Complement)
+            and g.symbols == list(symbols)
+            and g.k == self.k
+            and g.edges == list(self.edges)
+            and g.addEdges == addEdges
+        ):
+            return g.grammar
+        return Complement(g, symbols, self.k, self.edges, addEdges)
 
     def check_polarity(self):
         """Returns the polarity of the grammar ("p" or "n")."""
@@ -168,3 +583,209 @@ class L(object):
                 self.__polarity = "n"
             elif self.__polarity == "n":
                 self.__polarity = "p"
+
+    def allowed_ngram(self, ngram):
+        """Tells if the local ngram is allowed by the grammar."""
+        index = self.grammar_index(self.alphabet)
+        return (ngram in index) == (self.check_polarity() == "p")
+
+    def automaton_start(self):
+        """Returns the initial state of the automaton recognizing the
+        language, see `compiled_automaton`. By default, the grammar is
+        read as a list of local ngrams, and the state is the (k-1)-long
+        tuple of start symbols."""
+        return (self.edges[0],) * (self.k - 1)
+
+    def automaton_step(self, state, symbol):
+        """Reads the symbol from the given state.
+
+        Arguments:
+            state (tuple): the last k-1 symbols;
+            symbol (str): the symbol to be read.
+        Returns:
+            tuple: the next state, None if the ngram it completes
+                is not allowed.
+        """
+        ngram = state + (symbol,)
+        if not self.allowed_ngram(ngram):
+            return None
+        return ngram[1:]
+
+    def automaton_final(self, state):
+        """Tells if the ngrams ending with the end symbols are allowed
+        after the given state."""
+        tail = state + (self.edges[1],) * (self.k - 1)
+        return all(self.allowed_ngram(tail[i : i + self.k]) for i in range(self.k - 1))
+
+    def compiled_automaton(self):
+        """Compiles the language into a deterministic automaton reading the
+        symbols of the alphabet. Its states are given by the
+        `automaton_start`, `automaton_step` and `automaton_final` methods
+        of every class, and created when they are first reached.
+
+        Returns:
+            CompiledFSM: the automaton recognizing the language.
+        """
+        # imported here: the fsm module depends on this one
+        from sigmapie.fsm import CompiledFSM
+
+        if not self.alphabet:
+            raise ValueError("Alphabet cannot be empty.")
+        return CompiledFSM(
+            self.automaton_start(), self.automaton_step, self.automaton_final
+        )
+
+    def enumerate_strings(self, max_length=None):
+        """Lists the well-formed strings, shortest first, and strings of
+        the same length in the order of the alphabet. Only the prefixes
+        of well-formed strings are extended, so the time is proportional
+        to the size of the output.
+
+        Arguments:
+            max_length (int): the longest strings to list, there is no
+                limit if None.
+        Returns:
+            generator: distinct well-formed strings, listed lazily.
+        """
+        return self.compiled_automaton().enumerate(self.alphabet, max_length)
+
+    def sample_length(self, n, length, seed=None):
+        """Draws well-formed strings of the given length, every one of
+        them with the same probability. The strings are counted with
+        a dynamic program over the states of the compiled automaton,
+        see `compiled_automaton`, so no string is ever rejected.
+
+        Arguments:
+            n (int): the number of strings to be drawn;
+            length (int): the length of the strings;
+            seed (int): seed of the random number generator, the same
+                seed always gives the same sample.
+        Returns:
+            list: generated data sample, repetitions are allowed.
+        """
+        sample = self.compiled_automaton().sample(
+            self.alphabet, length, n, Random(seed)
+        )
+        if not sample and n:
+            raise ValueError(
+                "The grammar cannot produce strings of length " + str(length) + "."
+            )
+        return sample
+
+    def enumerate_sample(self, n, max_length=None):
+        """Lists the n shortest well-formed strings, see `enumerate_strings`.
+
+        Arguments:
+            n (int): the number of strings to be listed;
+            max_length (int): the longest strings to list, there is no
+                limit if None.
+        Returns:
+            list: distinct well-formed strings.
+        """
+        data = list(islice(self.enumerate_strings(max_length), n))
+        if len(data) < n:
+            print("The grammar cannot produce the requested number" " of strings.")
+        return data
+
+
+class Complement(object):
+    """A virtual grammar of the opposite polarity: it contains every
+    well-formed ngram over the given symbols that is not in the given
+    grammar. Membership, iteration and length are computed on demand
+    from the complemented grammar, so the opposite grammar is never
+    stored.
+
+    Attributes:
+        grammar (list): the complemented grammar;
+        symbols (list): alphabet of the ngrams;
+        k (int): locality window;
+        edges (list): start- and end-symbols;
+        addEdges (bool): whether the edge symbols are added to the
+            alphabet, see `L.generate_all_ngrams`.
+    """
+
+    def __init__(self, grammar, symbols, k, edges, addEdges=True):
+        """Initializes the Complement object."""
+        self.grammar = grammar
+        self.symbols = list(symbols)
+        self.k = k
+        self.edges = list(edges)
+        self.addEdges = addEdges
+
+        self.universe = L(alphabet=self.symbols, k=k, edges=self.edges)
+        symb = self.symbols[:]
+        if addEdges and not (self.edges[0] in symb or self.edges[1] in symb):
+            symb += self.edges
+        self.table = SymbolTable(symb)
+        self.present = {
+            self.table.encode(i) for i in grammar if self.in_universe(tuple(i))
+        }
+
+    def in_universe(self, ngram):
+        """Tells if the ngram is a well-formed ngram over the symbols."""
+        return (
+            len(ngram) == self.k
+            and all(s in self.table for s in ngram)
+            and self.universe.well_formed_ngram(ngram)
+        )
+
+    def __contains__(self, ngram):
+        ngram = tuple(ngram)
+        return self.in_universe(ngram) and self.table.encode(ngram) not in self.present
+
+    def __iter__(self):
+        for ngram in self.universe.generate_all_ngrams(
+            self.symbols, self.k, self.addEdges
+        ):
+            if self.table.encode(ngram) not in self.present:
+                yield ngram
+
+    def __len__(self):
+        total = self.universe.count_all_ngrams(self.symbols, self.k, self.addEdges)
+        return total - len(self.present)
+
+    def __eq__(self, other):
+        try:
+            return set(self) == set(other)
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return "Complement(" + repr(list(self)) + ")"
+
+    def get(self, state, default=None):
+        """Returns the symbols that can follow the given (k-1)-long state,
+        so that the complement can be used as a compiled SL table (see
+        `FSM.compile_sl`).
+
+        Arguments:
+            state (tuple): the (k-1)-long state.
+        Returns:
+            Successors: a container of the symbols.
+        """
+        return Successors(self, tuple(state))
+
+
+class Successors(object):
+    """Symbols that can follow a state in a `Complement` grammar."""
+
+    def __init__(self, complement, state):
+        self.complement = complement
+        self.state = state
+
+    def __contains__(self, symbol):
+        return self.state + (symbol,) in self.complement
+
+
+class TierProjection(dict):
+    """A `str.translate` table deleting the characters that are not on
+    the tier. Characters are added to the table when they are first
+    met, so the alphabet does not have to be known in advance."""
+
+    def __init__(self, tier):
+        super().__init__()
+        self.tier = frozenset(tier)
+
+    def __missing__(self, code):
+        self[code] = code if chr(code) in self.tier else None
+        return self[code]
@@ -88,7 +88,7 @@ def remove_from_prefix(w, pref):
     raise ValueError(pref + " is not a prefix of " + w)
 
 
-def progressBar(iterable, prefix = '', suffix = '', decimals = 1, length = 100, fill = '█', printEnd = "\r"):
+def progressBar(iterable, prefix = '', suffix = '', decimals = 1, length = 100, fill = '█', printEnd = "\r", total = None):
     """
     Helper method added to facilitate ease of evaluation. Taken from https://stackoverflow.com/questions/3173320/text-progress-bar-in-terminal-with-block-characters?noredirect=1&lq=1
     Call in a loop to create terminal progress bar
@@ -100,8 +100,10 @@ def progressBar(iterable, prefix = '', suffix = '', decimals = 1, length = 100,
         length      - Optional  : character length of bar (Int)
         fill        - Optional  : bar fill character (Str)
         printEnd    - Optional  : end character (e.g. "\r", "\r\n") (Str)
+        total       - Optional  : number of items, for iterables without len() (Int)
     """
-    total = len(iterable)
+    if total is None:
+        total = len(iterable)
     # Progress Bar Printing Function
     def printProgressBar (iteration):
         percent = ("{0:." + str(decimals) + "f}").format(100 * (iteration / float(total)))
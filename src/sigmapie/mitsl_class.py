@@ -70,9 +70,9 @@ class MITSL(MTSL):
 
     def extract_mgram_symbols(self):
         """Generates all m-length symbols from the data and saves in into the 'symbols' attribute """
-        self.symbols = list({"".join(gram) for gram in progressBar(self.generate_all_ngrams(self.alphabet, self.m, printProgressBar=True), prefix = "extracting symbols")}.union({edge * self.m for edge in self.edges}))
+        self.symbols = list({"".join(gram) for gram in self.generate_all_ngrams(self.alphabet, self.m, printProgressBar=True)}.union({edge * self.m for edge in self.edges}))
 
-    def learn(self, restrictions_remove = [], symbols_remove = []):
+    def learn(self, restrictions_remove = [], symbols_remove = [], workers = None):
         """
         Learns 2-local MITSL grammar for a given sample. The algorithm 
         currently works only for k=2 and is based on MITSL designed 
@@ -82,6 +82,7 @@ class MITSL(MTSL):
         Arguments:
             restrictions_remove (list of k-length tuples of m-length symbols representing restrictions, optional): the restrictions, from whose tiers, the symbols_remove symbols should be removed 
             symbols_remove (list of m-length str symbols): the symbols, which should be removed from the given tier
+            workers (int) (optional): number of processes the tiers of the unattested k-grams are computed in; the path index is sent to every process once per chunk of k-grams. By default, everything is done in the current process.
         Results:
             self.grammar is updated with a grammar of the following shape:
             {(tier_1):[bigrams_for_tier_1],
@@ -100,37 +101,44 @@ class MITSL(MTSL):
 
         self.data = list(set(self.data))#eliminate duplicates
 
-        possible = set(self.generate_all_ngrams(self.symbols, self.k, addEdges= False, printProgressBar=True))
+        table = self.symbol_table(self.symbols, addEdges=False)
+        possible = table.encode_all(self.generate_all_ngrams(self.symbols, self.k, addEdges= False, printProgressBar=True))
 
         attested = set()
         for d in progressBar(self.data, prefix = "annotating input, attesting k-grams"):
             d = self.annotate_string(d, asData = True)
             grams = [d[i:i+self.k*self.m] for i in range(len(d)-self.k*self.m+1)]
             grams = [(gram[:self.m], gram[self.m:]) for gram in grams]
-            attested.update(set(grams))
+            attested.update(table.encode_all(grams))
 
-        unattested = list(possible.difference(attested))
+        unattested = [table.decode(i, self.k) for i in sorted(possible - attested)]
 
 
-        paths = self.all_paths(self.data)
+        codes = self.path_symbols()
+        index = self.path_index(self.all_path_codes(self.data, codes))
 
-        grammar = []
-
-        b = list(self.symbols)
-        for p1, p2 in progressBar(unattested, prefix = "learning unattested grams"):
-            c = {p1, p2}
-            c.update([edge * self.m for edge in self.edges])
-            for s in b:
+        tiers = partial(_gram_tier, self.symbols, self.m, self.edges, codes, index)
+        prefix = "learning unattested grams"
+        if workers is None or workers < 2:
+            found = [tiers(gram) for gram in progressBar(unattested, prefix = prefix)]
+        else:
+            chunk = max(-(-len(unattested) // workers), 1)
+            with ProcessPoolExecutor(workers) as pool:
+                found = list(progressBar(pool.map(tiers, unattested, chunksize = chunk), prefix = prefix, total = len(unattested)))
+
+        missing_grams = set(unattested)
+        for p1, p2 in restrictions_remove:#This is a grammar engineering tool: it shows what paths would need to be added to remove particular Symbols from the tier containing particular Restrictions
+            if (p1, p2) not in missing_grams:
+                continue
+            masks = index.get((codes[p1], codes[p2]), set())
+            for s in symbols_remove:
                 if s == p1 or s == p2:
                     continue
-                relevant_paths = [path for path in paths if path[0] == p1 and s in path[1] and path[2] == p2]
-                paths_without_s = [[p[0], p[1].difference({s}), p[2]] for p in relevant_paths]
-                are_paths = [p in paths for p in paths_without_s]
-                _ = [print('add:', p) for p in paths_without_s if p not in paths and ((p1,p2) in restrictions_remove and s in symbols_remove)]#This is a grammar engineering tool: it shows what paths would need to be added to remove particular Symbols from the tier containing particular Restrictions
-                if not all(are_paths):
-                    c.add(s)
-
-            grammar.append((c, (p1, p2)))
+                missing = _missing_masks(masks, 1 << codes[s])
+                for p in self.decode_paths([(codes[p1], m, codes[p2]) for m in missing], codes):
+                    print('add:', p)
+
+        grammar = list(zip(found, unattested))
         gathered = self.gather_grammars(grammar)
         self.grammar = gathered
         self.tier = [i for i in self.grammar]
@@ -155,7 +163,7 @@ class MITSL(MTSL):
         for tier in self.grammar:
             t = tier
 
-            restrictions = self.grammar[tier]
+            restrictions = self.grammar_index(tier, addEdges=False, grammar=self.grammar[tier])
 
             projection = [kfactor for kfactor in bigrams if kfactor[0] in tier]
 
@@ -173,6 +181,57 @@ class MITSL(MTSL):
 
         return all(tier_evals)
 
+    def automaton_start(self):
+        """Returns the initial state of the automaton recognizing the
+        language, after reading the start symbols. See `automaton_step`."""
+        state = ((), ((None, self.m),) * len(self.grammar))
+        for s in self.edges[0] * self.m:
+            state = self.automaton_step(state, s)
+        return state
+
+    def automaton_step(self, state, symbol):
+        """Reads the symbol from the given state. A state keeps the last
+        m-1 symbols read, and, for every tier of the grammar, the last
+        m-gram on that tier together with the number of symbols read
+        since it started (at most m): as in `scan`, two consecutive tier
+        m-grams are only checked if they do not overlap.
+
+        Arguments:
+            state (tuple): the state, see above;
+            symbol (str): the symbol to be read.
+        Returns:
+            tuple: the next state, None if a pair of tier m-grams
+                is not allowed.
+        """
+        chars, tiers = state
+        chars += (symbol,)
+        if len(chars) < self.m:
+            return (chars, tiers)
+
+        mgram = "".join(chars)
+        positive = self.check_polarity() == "p"
+        new = []
+        for tier, (last, distance) in zip(self.grammar, tiers):
+            distance = min(distance + 1, self.m)
+            if mgram in tier:
+                if last is not None and distance > self.m - 1:
+                    index = self.grammar_index(
+                        tier, addEdges=False, grammar=self.grammar[tier]
+                    )
+                    if ((last, mgram) in index) != positive:
+                        return None
+                last, distance = mgram, 0
+            new.append((last, distance))
+        return (chars[1:], tuple(new))
+
+    def automaton_final(self, state):
+        """Tells if the end symbols can be read from the given state."""
+        for s in self.edges[1] * self.m:
+            state = self.automaton_step(state, s)
+            if state is None:
+                return False
+        return True
+
     def gather_grammars(self, grammar):
         """Gathers grammars with the same tier together.
 
@@ -204,20 +263,9 @@ class MITSL(MTSL):
         Returns:
             list: list of paths of `string`.
         """
-        string = self.annotate_string(string)
-        paths = set()
-
-        data = [string[i:i+self.m] for i in range(len(string) - self.m + 1)]
-        n = len(data)
-        for start in range(0, n-2):
-            for end in range(start+2, n):
-                first = data[start]
-                middle = tuple(sorted(set(data[start+1:end])))
-                last = data[end]
-                path = (first, middle, last)                
-                paths.add(path)
-
-        return paths
+        codes = self.path_symbols()
+        paths = self.decode_paths(self.path_codes(string, codes), codes)
+        return {(first, tuple(sorted(middle)), last) for first, middle, last in paths}
 
     def all_paths(self, dataset):
         """Finds all paths that are present in a list of strings.
@@ -227,11 +275,56 @@ class MITSL(MTSL):
         Returns:
             list: a list of paths present in `dataset`.
         """
-        paths = set()
-        for item in progressBar(dataset, prefix="calculating paths"):
-            paths.update(self.path(item))
+        codes = self.path_symbols()
+        paths = self.all_path_codes(dataset, codes)
+        return self.decode_paths(paths, codes)
 
-        return [[first, set(middle), last] for first, middle, last in paths]
+    def path_symbols(self):
+        """Returns the codes of the m-length symbols paths are stored with,
+        see `path_codes`: the dictionary of the form {symbol: int}."""
+        return dict(self.symbol_table(self.symbols, addEdges=False).index)
+
+    def path_codes(self, string, codes):
+        """Collects the paths of a string, see `path`, as triplets of
+        integers (a, X, b), see `MTSL.path_codes`. The symbols are the
+        m-length substrings, and `X` is never empty.
+
+        Arguments:
+            string (str): a string paths of which need to be found;
+            codes (dict): codes of the symbols, see `path_symbols`;
+                symbols without a code are added to it.
+        Returns:
+            dict: paths of `string` as keys, in the order they are
+                found.
+        """
+        string = self.annotate_string(string)
+        ids = [
+            codes.setdefault(string[i : i + self.m], len(codes))
+            for i in range(len(string) - self.m + 1)
+        ]
+        paths = {}
+        for i in range(len(ids) - 2):
+            first, between = ids[i], 1 << ids[i + 1]
+            for j in range(i + 2, len(ids)):
+                paths[(first, between, ids[j])] = None
+                between |= 1 << ids[j]
+        return paths
+
+    def all_path_codes(self, dataset, codes):
+        """Finds all paths that are present in a list of strings, see
+        `path_codes`.
+
+        Arguments:
+            dataset (list): a list of strings;
+            codes (dict): codes of the symbols, see `path_symbols`.
+        Returns:
+            dict: paths present in `dataset` as keys, in the order
+                they are found.
+        """
+        paths = {}
+        for item in progressBar(dataset, prefix="calculating paths"):
+            paths.update(self.path_codes(item, codes))
+        return paths
 
     def opposite_polarity(self):
         """Generates a grammar of the opposite polarity.
@@ -247,8 +340,7 @@ class MITSL(MTSL):
             )
         opposite = {}
         for i in self.grammar:
-            possib = self.generate_all_ngrams(list(i), self.k, addEdges=False)#check as tuple
-            opposite[i] = [j for j in possib if j not in self.grammar[i]]
+            opposite[i] = list(self.complement(list(i), addEdges=False, grammar=self.grammar[i]))
 
         return opposite
 
@@ -262,8 +354,9 @@ class MITSL(MTSL):
         """Builds FSM family corresponding to the given grammar"""
         restr_to_fsm = list()
 
-        grammar = self.grammar if self.check_polarity() == "p" else self.opposite_polarity()
-        for tier, ngrams in grammar.items():
+        for tier, ngrams in self.grammar.items():
+            if self.check_polarity() == "n":
+                ngrams = self.complement(list(tier), addEdges=False, grammar=ngrams)
             g = ngrams
             fsm = FSM(self.edges[0] * self.m, self.edges[1] * self.m)
             fsm.sl_to_fsm(g)
@@ -277,7 +370,9 @@ class MITSL(MTSL):
         restr_to_fsm = self.map_restrictions_to_fsms()
         self.fsm.family = [i[2] for i in restr_to_fsm]
 
-    def generate_sample(self, n=10, repeat=True, safe=True):
+    def generate_sample(
+        self, n=10, repeat=True, safe=True, exhaustive=False, max_length=None
+    ):
         """Generates a data sample of the required size, with or without
         repetitions depending on `repeat` value.
 
@@ -289,11 +384,18 @@ class MITSL(MTSL):
                 for example, when the grammar cannot generate the
                 required number of data items, and the repetitions
                 are set to False.
+            exhaustive (bool): if True and the repetitions are
+                prohibited, the n shortest well-formed strings are
+                listed instead of being sampled, see `enumerate_strings`;
+            max_length (int): the longest strings listed if
+                `exhaustive` is True, no limit if None.
         Returns:
             list: generated data sample.
         """
         if not self.alphabet:
             raise ValueError("Alphabet cannot be empty.")
+        if exhaustive and not repeat:
+            return self.enumerate_sample(n, max_length)
         if not self.fsm.family:
             self.fsmize()
 
@@ -316,12 +418,13 @@ class MITSL(MTSL):
             prev_len = len(data)
 
             while len(data) < n:
-                data.add(self.generate_item(tier_smap))
+                data.add(self.generate_item(tier_smap, main_smap))
 
                 if prev_len == len(data):
                     useless_loops += 1
                 else:
                     useless_loops = 0
+                prev_len = len(data)
 
                 if safe and useless_loops > 500:
                     print(
@@ -365,48 +468,53 @@ class MITSL(MTSL):
 
     def generate_item(self, tier_smap, main_smap = None):
         """Generates a well-formed string with respect to the given grammar.
+        The end of the image of the word on every tier is updated as the symbols are added, and the generation is started over when it runs into a corner or the word is ill-formed, at most 100 times.
         Arguments:
             tier_smap (dict): The dictionary of transitions within the FSMs that correspond to the tier grammars
             main_smap (dict) (optional): The dictionary of transitions within all FSMs of the FSM family, will be computed if not provided
         Returns:
             str: a well-formed string.
+        Raises:
+            ValueError: if no well-formed string was generated.
         """
-        word = (self.edges[0]*2,) * (self.k - 1) 
         main_smap = main_smap if main_smap is not None else self.general_state_map(tier_smap)#I am saving time by not recalculating this for each sample
-        tier_images = self.tier_image(word)
-
-        while word[-1] != self.edges[1] * self.m:
-            symbols = list(main_smap[word[-(self.k - 1) :][0]])
-            symbols = [symbol for symbol in symbols if symbol[:(self.m-1)] == word[-1][-(self.m-1):]]#This restriction ensures that adjacent symbols can be merged together at the end
-            shuffle(symbols)#just generating a list once and then going through it in a shuffled order is more efficient than picking a different random one each time
-            exhausted = True
-            for maybe in symbols:
-                good = True
-                for tier in tier_smap:
-                    if maybe in tier:
-                        old_image = [oldSymbol[0] for oldSymbol in tier_images[tier] if oldSymbol[1] < len(word) - (self.m - 1)]#this ignores any previous symbols that would overlap with the next symbol
-                        while len(old_image) < self.k - 1:
-                            old_image = [self.edges[0]*2] + old_image
-                        if maybe not in tier_smap[tier][tuple(old_image[-(self.k - 1) :])]:
-                            good = False
-                            break
-                if good:
-                    word += (maybe,)
-                    tier_images = self.tier_image(word)
-                    exhausted = False#we found a symbol that works here, so we did not exhaust our options
+        keep = (self.k - 1) + (self.m - 1)#the last k-1 tier symbols that do not overlap with the next symbol are among the last k-1 + m-1 ones
+
+        for attempt in range(100):
+            word = (self.edges[0]*2,) * (self.k - 1) 
+            tier_images = {tier: image[-keep:] for tier, image in self.tier_image(word).items()}
+
+            while word[-1] != self.edges[1] * self.m:
+                symbols = list(main_smap[word[-(self.k - 1) :][0]])
+                symbols = [symbol for symbol in symbols if symbol[:(self.m-1)] == word[-1][-(self.m-1):]]#This restriction ensures that adjacent symbols can be merged together at the end
+                shuffle(symbols)#just generating a list once and then going through it in a shuffled order is more efficient than picking a different random one each time
+                exhausted = True
+                for maybe in symbols:
+                    good = True
+                    for tier in tier_smap:
+                        if maybe in tier:
+                            old_image = [oldSymbol[0] for oldSymbol in tier_images[tier] if oldSymbol[1] < len(word) - (self.m - 1)]#this ignores any previous symbols that would overlap with the next symbol
+                            while len(old_image) < self.k - 1:
+                                old_image = [self.edges[0]*2] + old_image
+                            if maybe not in tier_smap[tier][tuple(old_image[-(self.k - 1) :])]:
+                                good = False
+                                break
+                    if good:
+                        for tier in tier_images:
+                            if maybe in self.edges or maybe in tier:
+                                tier_images[tier] = (tier_images[tier] + [(maybe, len(word))])[-keep:]
+                        word += (maybe,)
+                        exhausted = False#we found a symbol that works here, so we did not exhaust our options
+                        break
+                if exhausted:#we have generated ourselves into a corner, so the word is started over
                     break
-            if exhausted:
-                print('We have generated ourselves into a corner with the word', str(word), 'please check your grammar.')
-                return ""
 
-        print(word)
+            if word[-1] == self.edges[1] * self.m:
+                newword = self.merge_symbols(word)
+                if self.scan(newword):
+                    return newword
 
-        newword = self.merge_symbols(word)
-
-        if self.scan(newword):
-            return newword
-        else:
-            return self.generate_item(tier_smap)
+        raise ValueError("The grammar cannot produce a well-formed string. Check the grammar.")
 
     def tier_state_maps(self):
         """
@@ -498,14 +606,53 @@ class MITSL(MTSL):
             sl = SL()
             sl.change_polarity(self.check_polarity())
             sl.edges = [edge * self.m for edge in self.edges]
+            sl.fsm = FSM(initial=sl.edges[0], final=sl.edges[1])
             sl.alphabet = self.symbols
             sl.k = self.k
             sl.grammar = self.grammar[tier]
             sl.fsmize()
             sl.clean_grammar()
             self.grammar[tier] = deepcopy(sl.grammar)
-
-
-
-
-
+        self.invalidate()
+
+
+def _gram_tier(symbols, m, edges, codes, index, gram):
+    """Computes the tier of an unattested k-gram, see `MITSL.learn`.
+
+    Arguments:
+        symbols (list): the m-grams of the language, see `MITSL.symbols`;
+        m (int): the length of the symbols;
+        edges (list): start- and end-symbols;
+        codes (dict): the codes of the m-grams, see `MITSL.path_symbols`;
+        index (dict): the path index, see `MITSL.path_index`;
+        gram (tuple): the unattested k-gram.
+    Returns:
+        list: the m-grams of the tier of the k-gram, in the order of
+            `symbols`, so that equal tiers are gathered together
+            whichever process computed them.
+    """
+    p1, p2 = gram
+    c = {p1, p2}
+    c.update([edge * m for edge in edges])
+    masks = index.get((codes[p1], codes[p2]), set())
+    for s in symbols:
+        if s == p1 or s == p2:
+            continue
+        if _missing_masks(masks, 1 << codes[s]):
+            c.add(s)
+
+    return [s for s in symbols if s in c]
+
+
+def _missing_masks(masks, bit):
+    """Lists the paths that would need to be attested, as masks of the
+    symbols in-between, for the symbol with the given bit to be removed
+    from the tier.
+
+    Arguments:
+        masks (set): the masks of the paths between two symbols;
+        bit (int): the bit of the symbol.
+    Returns:
+        list: the masks of the missing paths.
+    """
+    return [m & ~bit for m in masks if m & bit and (m & ~bit) not in masks]
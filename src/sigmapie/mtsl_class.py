@@ -10,6 +10,8 @@ option) any later version.
 from copy import deepcopy
 from random import choice, randint
 from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from sigmapie.tsl_class import *
 from sigmapie.fsm_family import *
 
@@ -43,12 +45,18 @@ class MTSL(TSL):
             )
         self.tier = None
 
-    def learn(self):
+    def learn(self, workers=None):
         """
         Learns 2-local MTSL grammar for a given sample. The algorithm 
         currently works only for k=2 and is based on MTSL2IA designed 
         by McMullin, Aksenova and De Santo (2019). We are currently
         working on lifting the locality of the grammar to arbitrary k.
+        Arguments:
+            workers (int) (optional): number of processes the tiers
+                of the unattested bigrams are computed in; the path
+                index is sent to every process once per chunk of
+                bigrams. By default, everything is done in the
+                current process.
         Results:
             self.grammar is updated with a grammar of the following shape:
             {(tier_1):[bigrams_for_tier_1],
@@ -63,43 +71,25 @@ class MTSL(TSL):
                 "run `grammar.extract_alphabet`."
             )
 
-        possible = set(self.generate_all_ngrams(self.alphabet, self.k))
+        table = self.symbol_table()
+        possible = table.encode_all(self.generate_all_ngrams(self.alphabet, self.k))
         attested = set()
         for d in self.data:
             bigrams = self.ngramize_item(self.annotate_string(d))
-            attested.update(set(bigrams))
-        unattested = list(possible.difference(attested))
-
-        paths = self.all_paths(self.data)
-        grammar = []
-
-        for bgr in unattested:
-            tier = self.alphabet[:]
-
-            for s in self.alphabet:
-                rmv = True
-
-                # condition 1
-                if s in bgr:
-                    rmv = False
-                    continue
-
-                # condition 2
-                relevant_paths = []
-                for p in paths:
-                    if (p[0] == bgr[0]) and (p[-1] == bgr[-1]) and (s in p[1]):
-                        relevant_paths.append(p)
-                for rp in relevant_paths:
-                    new = [rp[0], set(i for i in rp[1] if i != s), rp[2]]
-                    if new not in paths:
-                        rmv = False
-                        break
-
-                # remove from the tier if passed both conditions
-                if rmv:
-                    tier.remove(s)
+            attested.update(table.encode_all(bigrams))
+        unattested = [table.decode(i, self.k) for i in sorted(possible - attested)]
+
+        codes = self.path_symbols()
+        index = self.path_index(self.all_path_codes(self.data, codes))
+        tiers = partial(_bigram_tier, self.alphabet, codes, index)
+        if workers is None or workers < 2:
+            found = list(map(tiers, unattested))
+        else:
+            chunk = -(-len(unattested) // workers)
+            with ProcessPoolExecutor(workers) as pool:
+                found = list(pool.map(tiers, unattested, chunksize=max(chunk, 1)))
 
-            grammar.append((tier, bgr))
+        grammar = list(zip(found, unattested))
         gathered = self.gather_grammars(grammar)
 
         self.grammar = gathered
@@ -111,29 +101,100 @@ class MTSL(TSL):
     def scan(self, string):
         """Scan string with respect to a given MTSL grammar.
 
+        The string is read once: every symbol only advances the tiers
+        it belongs to, see `tier_scanner`, and the completed tier ngram
+        is looked up in the restrictions of that tier.
         Arguments:
             string (str): a string that needs to be scanned.
         Returns:
             bool: well-formedness of the string.
         """
-        tier_evals = []
+        positive, indexes, members = self.tier_scanner()
+        state = list(self.automaton_start())
+
+        for s in string:
+            mask = members.get(s, 0)
+            while mask:
+                bit = mask & -mask
+                i = bit.bit_length() - 1
+                ngram = state[i] + (s,)
+                if (ngram in indexes[i]) != positive:
+                    return False
+                state[i] = ngram[1:]
+                mask ^= bit
+
+        return self.automaton_final(state)
+
+    def tier_scanner(self):
+        """Compiles the grammar for `scan`. The structure is cached
+        until the grammar, the polarity, the locality or the edges
+        change.
 
-        for tier in self.grammar:
-            t = tier
-            g = self.grammar[tier]
-
-            delete_non_tier = "".join([i for i in string if i in t])
-            tier_image = self.annotate_string(delete_non_tier)
-            ngrams = self.ngramize_item((tier_image))
-
-            this_tier = [(ngr in g) for ngr in ngrams]
+        Returns:
+            (bool, list, dict)
+                bool: True if the grammar is positive;
+                list: the indexed restrictions of every tier, in the
+                    order of the grammar, see `grammar_index`;
+                dict: the dictionary of the form {symbol: bitmask},
+                    where the i-th bit is set if the symbol is on the
+                    i-th tier.
+        """
 
-            if self.check_polarity() == "p":
-                tier_evals.append(all(this_tier))
-            else:
-                tier_evals.append(not any(this_tier))
+        def build():
+            indexes, members = [], {}
+            for i, tier in enumerate(self.grammar):
+                indexes.append(self.grammar_index(tier, grammar=self.grammar[tier]))
+                for s in tier:
+                    members[s] = members.get(s, 0) | (1 << i)
+            return self.check_polarity() == "p", indexes, members
+
+        return self._cached(
+            "tier_scanner",
+            build,
+            self.grammar,
+            self.check_polarity(),
+            self.k,
+            self.edges,
+        )
+
+    def automaton_start(self):
+        """Returns the initial state of the automaton recognizing the
+        language: for every tier of the grammar, in its order, the
+        (k-1)-long tuple of start symbols."""
+        return ((self.edges[0],) * (self.k - 1),) * len(self.grammar)
+
+    def automaton_step(self, state, symbol):
+        """Reads the symbol from the given state.
 
-        return all(tier_evals)
+        Arguments:
+            state (tuple): the last k-1 tier symbols of every tier;
+            symbol (str): the symbol to be read.
+        Returns:
+            tuple: the next state, None if the symbol completes a tier
+                ngram that is not allowed.
+        """
+        positive, indexes, members = self.tier_scanner()
+        mask = members.get(symbol, 0)
+        new = []
+        for i, last in enumerate(state):
+            if mask >> i & 1:
+                ngram = last + (symbol,)
+                if (ngram in indexes[i]) != positive:
+                    return None
+                last = ngram[1:]
+            new.append(last)
+        return tuple(new)
+
+    def automaton_final(self, state):
+        """Tells if the tier ngrams ending with the end symbols are allowed
+        after the given state."""
+        positive, indexes, members = self.tier_scanner()
+        for index, last in zip(indexes, state):
+            tail = last + (self.edges[1],) * (self.k - 1)
+            for i in range(self.k - 1):
+                if (tail[i : i + self.k] in index) != positive:
+                    return False
+        return True
 
     def gather_grammars(self, grammar):
         """Gathers grammars with the same tier together.
@@ -166,19 +227,9 @@ class MTSL(TSL):
         Returns:
             list: list of paths of `string`.
         """
-        string = self.annotate_string(string)
-        paths = []
-
-        for i in range(len(string) - 1):
-            for j in range(i + 1, len(string)):
-                path = [string[i]]
-                path.append(set(k for k in string[(i + 1) : j]))
-                path.append(string[j])
-
-                if path not in paths:
-                    paths.append(path)
-
-        return paths
+        codes = self.path_symbols()
+        paths = self.path_codes(string, codes)
+        return self.decode_paths(paths, codes)
 
     def all_paths(self, dataset):
         """Finds all paths that are present in a list of strings.
@@ -188,14 +239,86 @@ class MTSL(TSL):
         Returns:
             list: a list of paths present in `dataset`.
         """
-        paths = []
-        for item in dataset:
-            for p in self.path(item):
-                if p not in paths:
-                    paths.append(p)
+        codes = self.path_symbols()
+        paths = self.all_path_codes(dataset, codes)
+        return self.decode_paths(paths, codes)
+
+    def path_symbols(self):
+        """Returns the codes of the symbols paths are stored with, see
+        `path_codes`: the dictionary of the form {symbol: int}."""
+        return dict(self.symbol_table().index)
+
+    def path_codes(self, string, codes):
+        """Collects the paths of a string, see `path`, as triplets of
+        integers (a, X, b): `a` and `b` are the codes of the symbols,
+        and `X` is the bitmask of the codes of the symbols in-between.
+        `X` is extended by one symbol every time `b` moves to the right.
 
+        Arguments:
+            string (str): a string paths of which need to be found;
+            codes (dict): codes of the symbols, see `path_symbols`;
+                symbols without a code are added to it.
+        Returns:
+            dict: paths of `string` as keys, in the order they are
+                found.
+        """
+        ids = [codes.setdefault(s, len(codes)) for s in self.annotate_string(string)]
+        paths = {}
+        for i in range(len(ids) - 1):
+            first, between = ids[i], 0
+            for j in range(i + 1, len(ids)):
+                paths[(first, between, ids[j])] = None
+                between |= 1 << ids[j]
         return paths
 
+    def all_path_codes(self, dataset, codes):
+        """Finds all paths that are present in a list of strings, see
+        `path_codes`.
+
+        Arguments:
+            dataset (list): a list of strings;
+            codes (dict): codes of the symbols, see `path_symbols`.
+        Returns:
+            dict: paths present in `dataset` as keys, in the order
+                they are found.
+        """
+        paths = {}
+        for item in dataset:
+            paths.update(self.path_codes(item, codes))
+        return paths
+
+    def path_index(self, paths):
+        """Indexes paths given by `path_codes` by the symbols they start
+        and end with.
+
+        Arguments:
+            paths (iterable): paths given by `path_codes`.
+        Returns:
+            dict: the dictionary of the form
+                {(code of a, code of b): {bitmasks X of paths <a, X, b>}}.
+        """
+        index = {}
+        for first, between, last in paths:
+            index.setdefault((first, last), set()).add(between)
+        return index
+
+    def decode_paths(self, paths, codes):
+        """Turns paths stored as integers back into lists [a, X, b] where
+        `X` is a set of symbols.
+
+        Arguments:
+            paths (iterable): paths given by `path_codes`;
+            codes (dict): codes of the symbols, see `path_symbols`.
+        Returns:
+            list: the decoded paths.
+        """
+        symbols = list(codes)
+        decoded = []
+        for first, between, last in paths:
+            middle = {s for i, s in enumerate(symbols) if between >> i & 1}
+            decoded.append([symbols[first], middle, symbols[last]])
+        return decoded
+
     def opposite_polarity(self):
         """Generates a grammar of the opposite polarity.
 
@@ -210,8 +333,7 @@ class MTSL(TSL):
             )
         opposite = {}
         for i in self.grammar:
-            possib = self.generate_all_ngrams(list(i), self.k)
-            opposite[i] = [j for j in possib if j not in self.grammar[i]]
+            opposite[i] = list(self.complement(list(i), grammar=self.grammar[i]))
 
         return opposite
 
@@ -263,7 +385,9 @@ class MTSL(TSL):
         restr_to_fsm = self.map_restrictions_to_fsms()
         self.fsm.family = [i[2] for i in restr_to_fsm]
 
-    def generate_sample(self, n=10, repeat=True, safe=True):
+    def generate_sample(
+        self, n=10, repeat=True, safe=True, exhaustive=False, max_length=None
+    ):
         """Generates a data sample of the required size, with or without
         repetitions depending on `repeat` value.
 
@@ -275,11 +399,18 @@ class MTSL(TSL):
                 for example, when the grammar cannot generate the
                 required number of data items, and the repetitions
                 are set to False.
+            exhaustive (bool): if True and the repetitions are
+                prohibited, the n shortest well-formed strings are
+                listed instead of being sampled, see `enumerate_strings`;
+            max_length (int): the longest strings listed if
+                `exhaustive` is True, no limit if None.
         Returns:
             list: generated data sample.
         """
         if not self.alphabet:
             raise ValueError("Alphabet cannot be empty.")
+        if exhaustive and not repeat:
+            return self.enumerate_sample(n, max_length)
         if not self.fsm.family:
             self.fsmize()
 
@@ -293,7 +424,8 @@ class MTSL(TSL):
                 )
             )
 
-        data = [self.generate_item(tier_smap) for i in range(n)]
+        main_smap = self.general_state_map(tier_smap)
+        data = [self.generate_item(tier_smap, main_smap) for i in range(n)]
 
         if not repeat:
             data = set(data)
@@ -301,12 +433,13 @@ class MTSL(TSL):
             prev_len = len(data)
 
             while len(data) < n:
-                data.add(self.generate_item(tier_smap))
+                data.add(self.generate_item(tier_smap, main_smap))
 
                 if prev_len == len(data):
                     useless_loops += 1
                 else:
                     useless_loops = 0
+                prev_len = len(data)
 
                 if safe and useless_loops > 500:
                     print(
@@ -331,42 +464,58 @@ class MTSL(TSL):
         """
         tiers = {}
         for i in self.grammar:
-            curr_tier = ""
-            for s in string:
-                if s in self.edges or s in i:
-                    curr_tier += s
-            tiers[i] = curr_tier
+            tiers[i] = self.tier_projection(string, tuple(self.edges) + tuple(i))
         return tiers
 
-    def generate_item(self, tier_smap):
+    def generate_item(self, tier_smap, main_smap=None):
         """Generates a well-formed string with respect to the given grammar.
 
+        The last k-1 symbols of the image of the word on every tier are
+        updated as the symbols are added, and the generation is started
+        over until the word is well-formed, at most 100 times.
+        Arguments:
+            tier_smap (dict): the transitions within the tier FSMs,
+                see `tier_state_maps`;
+            main_smap (dict) (optional): the transitions within all
+                the FSMs, see `general_state_map`; computed if not
+                provided.
         Returns:
             str: a well-formed string.
+        Raises:
+            ValueError: if no well-formed string was generated.
         """
-        word = self.edges[0] * (self.k - 1)
-        main_smap = self.general_state_map(tier_smap)
-        tier_images = self.tier_image(word)
-
-        while word[-1] != self.edges[1]:
-            maybe = choice(main_smap[word[-(self.k - 1) :]])
-            good = True
-            for tier in tier_smap:
-                if tier == ('<<',):
-                    True# # # # #
-                if maybe in tier:
-                    old_image = tier_images[tier]
-                    if maybe not in tier_smap[tier][old_image[-(self.k - 1) :]]:
+        if main_smap is None:
+            main_smap = self.general_state_map(tier_smap)
+        start = (self.edges[0],) * (self.k - 1)
+
+        for attempt in range(100):
+            word = self.edges[0] * (self.k - 1)
+            last = {tier: start for tier in tier_smap}
+            useless_loops = 0
+
+            while word[-1] != self.edges[1] and useless_loops <= 100:
+                maybe = choice(main_smap[tuple(word[-(self.k - 1) :])])
+                good = True
+                for tier in tier_smap:
+                    if maybe in tier and maybe not in tier_smap[tier][last[tier]]:
                         good = False
-            if good:
-                word += maybe
-                tier_images = self.tier_image(word)
+                        break
+                if good:
+                    word += maybe
+                    for tier in tier_smap:
+                        if maybe in tier:
+                            last[tier] = (last[tier] + (maybe,))[1:]
+                    useless_loops = 0
+                else:
+                    useless_loops += 1
 
-        newword = word[(self.k - 1) : -1]
-        if self.scan(newword):
-            return newword
-        else:
-            return self.generate_item(tier_smap)
+            newword = word[(self.k - 1) : -1]
+            if word[-1] == self.edges[1] and self.scan(newword):
+                return newword
+
+        raise ValueError(
+            "The grammar cannot produce a well-formed string. Check the grammar."
+        )
 
     def tier_state_maps(self):
         """
@@ -406,8 +555,8 @@ class MTSL(TSL):
         FSMs of the FSM family.
         Returns:
             dict: the dictionary of the form
-                {"keys":[list of next symbols]}, where 
-                keys are (k-1)-long strings.
+                {(keys):[list of next symbols]}, where 
+                keys are (k-1)-long tuples of symbols.
         Warning: the list of next symbols is tier-specific,
             so this estimates the rough options: refer to
             generate_item for the filtering of wrongly
@@ -441,7 +590,7 @@ class MTSL(TSL):
 
         ext_alphabet = deepcopy(self.alphabet) + [self.edges[1]]
         for x in free_ones:
-            main_smap[x] = ext_alphabet
+            main_smap[(x,)] = ext_alphabet
 
         return main_smap
 
@@ -457,9 +606,39 @@ class MTSL(TSL):
             sl = SL()
             sl.change_polarity(self.check_polarity())
             sl.edges = self.edges
+            sl.fsm = FSM(initial=sl.edges[0], final=sl.edges[1])
             sl.alphabet = list(tier)
             sl.k = self.k
             sl.grammar = self.grammar[tier]
             sl.fsmize()
             sl.clean_grammar()
             self.grammar[tier] = deepcopy(sl.grammar)
+        self.invalidate()
+
+
+def _bigram_tier(alphabet, codes, index, bgr):
+    """Computes the tier of an unattested bigram, see `MTSL.learn`.
+
+    Arguments:
+        alphabet (list): the alphabet of the language;
+        codes (dict): the codes of the symbols, see `MTSL.path_symbols`;
+        index (dict): the path index, see `MTSL.path_index`;
+        bgr (tuple): the unattested bigram.
+    Returns:
+        list: the symbols of the tier of the bigram.
+    """
+    tier = alphabet[:]
+    masks = index.get((codes[bgr[0]], codes[bgr[-1]]), set())
+
+    for s in alphabet:
+        # condition 1
+        if s in bgr:
+            continue
+
+        # condition 2: removing s from every path between the
+        # symbols of the bigram gives an attested path
+        bit = 1 << codes[s]
+        if all((m & ~bit) in masks for m in masks if m & bit):
+            tier.remove(s)
+
+    return tier
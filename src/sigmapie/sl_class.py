@@ -11,6 +11,11 @@ from sigmapie.helper import *
 from sigmapie.fsm import *
 from sigmapie.grammar import *
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 class SL(L):
     """A class for strictly local grammars and languages.
@@ -64,6 +69,37 @@ class SL(L):
 
         return list(set(ngrams))
 
+    def ngramize_data_windows(self, ks):
+        """Creates sets of n-grams of several sizes based on the given data,
+        annotating every string only once, with the edge symbols needed
+        by the largest size. Smaller windows made of edge symbols only
+        are skipped, so the n-grams of every size are the ones that
+        `ngramize_data` finds with that value of k.
+
+        Arguments:
+            ks (list): sizes of the n-grams.
+        Returns:
+            dict: the dictionary of the form {size: set of ngrams}.
+        """
+        if not self.data:
+            raise ValueError("The data is not provided.")
+
+        pad = max(ks) - 1
+        ngrams = {k: set() for k in ks}
+        for s in self.data:
+            item = self.edges[0] * pad + s.strip() + self.edges[1] * pad
+            for k in ks:
+                if k == 0:
+                    ngrams[k].add(())
+                    continue
+                first = max(0, pad - k + 1)
+                last = min(len(item) - k, len(item) - pad - 1)
+                # the j-th column of the windows starts at first + j
+                columns = [item[first + j : last + 1 + j] for j in range(k)]
+                ngrams[k].update(zip(*columns))
+
+        return ngrams
+
     def ngramize_item(self, item):
         """This function n-gramizes a given string.
 
@@ -80,7 +116,12 @@ class SL(L):
 
     def fsmize(self):
         """Builds FSM corresponding to the given grammar and saves it in the
-        fsm attribute."""
+        fsm attribute.
+
+        The transitions are also compiled into a table that maps every
+        (k-1)-long state to the symbols allowed after it, see
+        `FSM.compile_sl`.
+        """
         if not self.grammar:
             raise (IndexError("The grammar must not be empty."))
         if not self.alphabet:
@@ -91,25 +132,99 @@ class SL(L):
         if self.check_polarity() == "p":
             self.fsm.sl_to_fsm(self.grammar)
         else:
-            opposite = self.opposite_polarity(self.alphabet)
-            self.fsm.sl_to_fsm(opposite)
+            self.fsm.sl_to_fsm(self.complement(self.alphabet))
 
     def scan(self, string):
         """Checks if the given string is well-formed with respect to the given
-        grammar.
+        grammar. The string is read in a single pass over the compiled
+        transition table, and the scan stops at the first window that
+        cannot be read.
 
         Arguments:
             string (str): the string that needs to be evaluated.
         Returns:
             bool: well-formedness value of a string.
         """
-        if not self.fsm.transitions:
+        if self.fsm.table is None and not self.fsm.transitions:
             self.fsmize()
 
         string = self.annotate_string(string)
         return self.fsm.scan_sl(string)
 
-    def generate_sample(self, n=10, repeat=True, safe=True):
+    def scan_many(self, strings):
+        """Checks well-formedness of a whole list of strings at once.
+
+        Arguments:
+            strings (list): the strings that need to be evaluated.
+        Returns:
+            numpy.ndarray: boolean vector of well-formedness values,
+                one per input string.
+        """
+        if not self.alphabet:
+            raise ValueError(
+                "The alphabet is not provided. " "Use `grammar.extract_alphabet()`."
+            )
+        annotated = [self.annotate_string(s) for s in strings]
+        return self.scan_annotated_many(annotated, self.alphabet)
+
+    def scan_annotated_many(self, annotated, symbols):
+        """Vectorized scanner shared by `scan_many` of SL and TSL. Every
+        symbol is encoded as an integer, every window of the annotated
+        strings gets a base-|symbols| n-gram id, and the ids are looked
+        up in a boolean table of allowed n-grams.
+
+        Arguments:
+            annotated (list): strings annotated with the edge symbols;
+            symbols (list): symbols the grammar is stated over, the
+                edge symbols are added automatically.
+        Returns:
+            numpy.ndarray: boolean vector of well-formedness values.
+        """
+        if np is None:
+            raise ImportError("`scan_many` requires NumPy to be installed.")
+
+        index = self.symbol_table(symbols).index
+        # the last code is reserved for symbols outside of the grammar
+        unknown = len(index)
+        base = unknown + 1
+
+        allowed = np.zeros((base,) * self.k, dtype=bool)
+        if self.check_polarity() == "n":
+            allowed[(slice(0, unknown),) * self.k] = True
+        value = self.check_polarity() == "p"
+        for ngram in self.grammar:
+            if len(ngram) == self.k and all(i in index for i in ngram):
+                allowed[tuple(index[i] for i in ngram)] = value
+        allowed = allowed.ravel()
+
+        result = np.ones(len(annotated), dtype=bool)
+        lengths = np.fromiter((len(s) for s in annotated), dtype=np.int64)
+        total = int(lengths.sum())
+        if total < self.k:
+            return result
+
+        codes = np.fromiter(
+            (index.get(c, unknown) for s in annotated for c in s),
+            dtype=np.int64,
+            count=total,
+        )
+        owner = np.repeat(np.arange(len(annotated)), lengths)
+
+        windows = total - self.k + 1
+        ids = np.zeros(windows, dtype=np.int64)
+        for j in range(self.k):
+            ids = ids * base + codes[j : j + windows]
+
+        # windows crossing the border of two strings are not checked
+        valid = owner[: windows] == owner[self.k - 1 :]
+        bad = valid & ~allowed[ids]
+        result[owner[: windows][bad]] = False
+
+        return result
+
+    def generate_sample(
+        self, n=10, repeat=True, safe=True, exhaustive=False, max_length=None
+    ):
         """Generates a data sample of the required size, with or without
         repetitions depending on `repeat` value.
 
@@ -121,11 +236,18 @@ class SL(L):
                 for example, when the grammar cannot generate the
                 required number of data items, and the repetitions
                 are set to False.
+            exhaustive (bool): if True and the repetitions are
+                prohibited, the n shortest well-formed strings are
+                listed instead of being sampled, see `enumerate_strings`;
+            max_length (int): the longest strings listed if
+                `exhaustive` is True, no limit if None.
         Returns:
             list: generated data sample.
         """
         if not self.alphabet:
             raise ValueError("Alphabet cannot be empty.")
+        if exhaustive and not repeat:
+            return self.enumerate_sample(n, max_length)
         if not self.fsm.transitions:
             self.fsmize()
 
@@ -153,6 +275,7 @@ class SL(L):
                     useless_loops += 1
                 else:
                     useless_loops = 0
+                prev_len = len(data)
 
                 if safe and useless_loops > 500:
                     print(
@@ -164,6 +287,119 @@ class SL(L):
 
         return list(data)
 
+    def generate_bulk(self, n=10, seed=None, min_length=0, max_length=None, safe=True):
+        """Generates a data sample of the required size by drawing many
+        random walks through the state map at once. The successors of
+        every state are stored in arrays, and every step of all the
+        walks is a single array operation. As in `generate_item`, the
+        next symbol is chosen uniformly among the possible ones.
+
+        Arguments:
+            n (int): the number of examples to be generated;
+            seed (int): seed of the random number generator, the same
+                seed always gives the same sample;
+            min_length (int): shorter strings are discarded and drawn
+                again;
+            max_length (int): longer strings are discarded and drawn
+                again, the walks are stopped as soon as they get too
+                long; no limit if None;
+            safe (bool): automatically breaks out of infinite loops,
+                for example, when the grammar cannot generate strings
+                of the required length.
+        Returns:
+            list: generated data sample, repetitions are allowed.
+        """
+        if np is None:
+            raise ImportError("`generate_bulk` requires NumPy to be installed.")
+        if not self.alphabet:
+            raise ValueError("Alphabet cannot be empty.")
+        if not self.fsm.transitions:
+            self.fsmize()
+
+        statemap = self.state_map()
+        if not any([len(statemap[x]) for x in statemap]):
+            raise (
+                ValueError(
+                    "There are ngrams in the grammar that are"
+                    " not leading anywhere. Clean the grammar "
+                    " or run `grammar.clean_grammar()`."
+                )
+            )
+
+        # states are numbered, the last number is the state with no exit
+        states = {state: i for i, state in enumerate(statemap)}
+        stuck = len(states)
+        symbols = list({j: None for i in statemap.values() for j in i})
+        codes = {j: i for i, j in enumerate(symbols)}
+        end = codes.get(self.edges[1], -1)
+
+        width = max(len(i) for i in statemap.values())
+        degree = np.zeros(stuck + 1, dtype=np.int64)
+        next_state = np.full((stuck + 1, width), stuck, dtype=np.int64)
+        next_symbol = np.full((stuck + 1, width), end, dtype=np.int64)
+        for state, i in states.items():
+            degree[i] = len(statemap[state])
+            for j, symbol in enumerate(statemap[state]):
+                next_symbol[i, j] = codes[symbol]
+                if symbol != self.edges[1]:
+                    next_state[i, j] = states.get((state + (symbol,))[1:], stuck)
+        start = states.get((self.edges[0],) * (self.k - 1), stuck)
+
+        rng = np.random.default_rng(seed)
+        data = []
+        useless_loops = 0
+        while len(data) < n:
+            m = n - len(data)
+            current = np.full(m, start, dtype=np.int64)
+            length = np.zeros(m, dtype=np.int64)
+            walking = np.arange(m)
+            ended = np.zeros(m, dtype=bool)
+            walkers, letters = [], []
+
+            while len(walking):
+                walking = walking[degree[current[walking]] > 0]
+                here = current[walking]
+                pick = (rng.random(len(walking)) * degree[here]).astype(np.int64)
+                symbol = next_symbol[here, pick]
+                current[walking] = next_state[here, pick]
+
+                done = symbol == end
+                ended[walking[done]] = True
+                walking, symbol = walking[~done], symbol[~done]
+                walkers.append(walking)
+                letters.append(symbol)
+                length[walking] += 1
+                if max_length is not None:
+                    walking = walking[length[walking] <= max_length]
+
+            good = ended & (length >= min_length)
+            if max_length is not None:
+                good &= length <= max_length
+
+            # the symbols of every walk are put together, in their order
+            walkers = np.concatenate(walkers)
+            letters = np.concatenate(letters)[np.argsort(walkers, kind="stable")]
+            letters = letters.tolist()
+            offsets = np.concatenate(([0], np.cumsum(length))).tolist()
+            for i in np.flatnonzero(good).tolist():
+                word = letters[offsets[i] : offsets[i + 1]]
+                data.append("".join([symbols[j] for j in word]))
+
+            if good.any():
+                useless_loops = 0
+            else:
+                useless_loops += 1
+
+            if safe and useless_loops > 500:
+                print(
+                    "The grammar cannot produce the requested "
+                    "number of strings. Check the grammar, "
+                    "or change the length limits."
+                )
+                break
+
+        return data
+
     def generate_item(self, statemap):
         """Generates a well-formed string with respect to the given grammar.
 
@@ -175,38 +411,25 @@ class SL(L):
         """
         word = self.edges[0] * (self.k - 1)
         while word[-1] != self.edges[1]:
-            word += choice(statemap[word[-(self.k - 1) :]])
+            word += choice(statemap[tuple(word[-(self.k - 1) :])])
         return word[(self.k - 1) : -1]
 
     def state_map(self, addEdges = True):
         """
         Generates a dictionary of possible transitions in the FSM.
+        The map is kept on the FSM until its transitions change,
+        see `FSM.state_map`.
         Returns:
             dict: the dictionary of the form
-                {"keys":[list of possible next symbols]}, where 
-                keys are (k-1)-long strings.
+                {(keys):[list of possible next symbols]}, where 
+                keys are (k-1)-long tuples of symbols.
         """
-        
         # #local_alphabet = self.alphabet[:] + self.edges[:]
         # #updated for MITSL
-        local_alphabet = self.alphabet[:]
+        local_alphabet = list(self.alphabet)
         if addEdges:
-            local_alphabet += self.edges[:]
-
-        poss = product(local_alphabet, repeat=(self.k - 1))
-
-        smap = {}
-        for i in poss:
-            for j in self.fsm.transitions:
-                if j[0] == i:
-                    # #before = "".join(i)
-                    before = tuple(i)
-                    if before in smap:
-                        # #smap[before] += j[1]
-                        smap[before] += [j[1]]# #updated for MITSL
-                    else:
-                        smap[before] = [j[1]]
-        return smap
+            local_alphabet += self.edges
+        return self.fsm.state_map(local_alphabet)
 
     def switch_polarity(self):
         """Changes polarity of the grammar, and changes the grammar to the
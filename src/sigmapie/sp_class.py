@@ -8,6 +8,8 @@ option) any later version.
 
 from random import choice
 from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 from sigmapie.grammar import *
 from sigmapie.fsm import *
@@ -35,6 +37,9 @@ class SP(L):
     def subsequences(self, string):
         """Extracts k-long subsequences out of the given word.
 
+        The word is read once: every symbol extends the distinct shorter
+        subsequences of the prefix before it, so the work per symbol is
+        bounded by the number of (k-1)-long subsequences, |alphabet|^(k-1).
         Arguments:
             string (str): a string that needs to be processed.
         Returns:
@@ -43,27 +48,26 @@ class SP(L):
         if len(string) < self.k:
             return []
 
-        start = list(string[: self.k])
-        result = [start]
+        # seen[j] keeps j-long subsequences of the prefix read so far
+        seen = [set() for i in range(self.k)]
+        seen[0].add(())
+        result = set()
 
-        previous_state = [start]
-        current_state = []
+        for s in string:
+            result.update(p + (s,) for p in seen[self.k - 1])
+            for j in range(self.k - 1, 0, -1):
+                seen[j].update(p + (s,) for p in seen[j - 1])
 
-        for s in string[self.k :]:
-            for p in previous_state:
-                for i in range(self.k):
-                    new = p[:i] + p[i + 1 :] + [s]
-                    if new not in current_state:
-                        current_state.append(new)
-            result.extend(current_state)
-            previous_state = current_state[:]
-            current_state = []
+        return list(result)
 
-        return list(set([tuple(i) for i in result]))
-
-    def learn(self):
+    def learn(self, workers=None):
         """Extracts k-long subsequences from the training data.
 
+        Arguments:
+            workers (int) (optional): number of processes the data is
+                split between; the subsequences found by every process
+                are then united. By default, everything is done in
+                the current process.
         Results:
             self.grammar is updated.
         """
@@ -76,30 +80,46 @@ class SP(L):
                 "run `grammar.extract_alphabet()`."
             )
 
-        self.grammar = []
-        for i in self.data:
-            for j in self.subsequences(i):
-                if j not in self.grammar:
-                    self.grammar.append(j)
+        if workers is None or workers < 2:
+            found = _data_subsequences(self.k, self.data)
+        else:
+            shards = [self.data[i::workers] for i in range(workers)]
+            with ProcessPoolExecutor(workers) as pool:
+                found = set().union(*pool.map(partial(_data_subsequences, self.k), shards))
+
+        self.grammar = sorted(found)
 
         if self.check_polarity() == "n":
             self.grammar = self.opposite_polarity()
 
     def opposite_polarity(self):
         """Returns the grammar opposite to the current one."""
-        all_ngrams = product(self.alphabet, repeat=self.k)
-        return [i for i in all_ngrams if i not in self.grammar]
+        return list(self.complement(self.alphabet, addEdges=False))
 
-    def fsmize(self):
+    def fsmize(self, compiled=False):
         """Creates FSM family for the given SP grammar by passing every
-        encountered subsequence through the corresponding automaton."""
+        encountered subsequence through the corresponding automaton.
+
+        Arguments:
+            compiled (bool): if True, the family is replaced by a single
+                automaton whose states are the states of the scanner
+                (see `scanner_state`); only the grammar is indexed, and
+                the states are created as strings are read.
+        """
         if not self.grammar:
             self.learn()
 
+        self.fsm.family = []
+        self.fsm.compiled = None
+        if compiled:
+            initial = self.product_state(self.scanner_state())
+            self.fsm.compiled = CompiledFSM(initial, self.product_step)
+            return
+
         if self.check_polarity() == "p":
-            data_subseq = self.grammar[:]
+            data_subseq = self.grammar
         else:
-            data_subseq = self.opposite_polarity()
+            data_subseq = self.complement(self.alphabet, addEdges=False)
 
         # create a family of templates in fsm attribute
         seq = product(self.alphabet, repeat=self.k - 1)
@@ -120,21 +140,163 @@ class SP(L):
     def scan(self, string):
         """Tells if the input string is well-formed.
 
+        The string is read from left to right, keeping track of the
+        subsequences seen so far (see `scanner_state`), and it is
+        rejected as soon as a forbidden k-subsequence is completed.
         Arguments:
             string (str): string to be scanned.
         Returns:
             bool: True is well-formed, otherwise False.
         """
-        subseq = self.subsequences(string)
-        found_in_G = [(s in self.grammar) for s in subseq]
+        if self.fsm.compiled is not None:
+            return self.fsm.compiled.scan(string)
 
-        if self.check_polarity == "p":
-            return all(found_in_G)
-        else:
-            return not any(found_in_G)
+        state = self.scanner_state()
+
+        for s in string:
+            if not self.completes_allowed(state, s):
+                return False
+            self.advance(state, s)
+
+        return True
+
+    def successor_index(self):
+        """Indexes the grammar by the first k-1 symbols of its subsequences.
+        A complement grammar is indexed through the grammar it complements,
+        with the opposite polarity, so it is never expanded.
+
+        Returns:
+            (dict, bool)
+                dict: the dictionary of the form
+                    {(k-1)-long subsequence: {possible last symbols}};
+                bool: True if the last symbols are the allowed ones,
+                    False if they are the forbidden ones.
+        """
+
+        def build():
+            grammar, positive = self.grammar, self.check_polarity() == "p"
+            if isinstance(grammar, Complement):
+                grammar, positive = grammar.grammar, not positive
+            successors = {}
+            for i in grammar:
+                if len(i) == self.k:
+                    successors.setdefault(tuple(i[:-1]), set()).add(i[-1])
+            return successors, positive
+
+        return self._cached(
+            "successor_index", build, self.grammar, self.check_polarity(), self.k
+        )
+
+    def scanner_state(self):
+        """Creates the initial state of the left-to-right scanner.
+
+        Returns:
+            list: a list of k+2 items: for j < k, the j-th item is the
+                set of j-long subsequences of the prefix read so far;
+                the k-th item restricts the next symbol: it is the set
+                of allowed symbols for a positive grammar (None if
+                nothing is restricted yet), and the set of forbidden
+                ones for a negative grammar; the last item is the
+                indexed grammar, see `successor_index`, fetched once
+                for the whole string.
+        """
+        successors, positive = self.successor_index()
+        state = [set() for i in range(self.k)]
+        state += [None if positive else set(), (successors, positive)]
+        self.add_subsequences(state, [()], 0)
+        return state
+
+    def add_subsequences(self, state, new, j):
+        """Adds newly seen j-long subsequences to the scanner state and
+        updates the restriction on the next symbol."""
+        state[j].update(new)
+        if j == self.k - 1:
+            successors, positive = state[-1]
+            for p in new:
+                after = successors.get(p, set())
+                if not positive:
+                    state[-2] |= after
+                elif state[-2] is None:
+                    state[-2] = set(after)
+                else:
+                    state[-2] &= after
+
+    def completes_allowed(self, state, symbol):
+        """Tells if reading the symbol completes only allowed k-long
+        subsequences.
+
+        Arguments:
+            state (list): the scanner state, see `scanner_state`;
+            symbol (str): the next symbol.
+        Returns:
+            bool: False if a forbidden subsequence is completed.
+        """
+        if state[-1][1]:
+            return state[-2] is None or symbol in state[-2]
+        return symbol not in state[-2]
+
+    def advance(self, state, symbol):
+        """Updates the scanner state after reading the symbol.
+
+        Arguments:
+            state (list): the scanner state, see `scanner_state`;
+            symbol (str): the symbol that was read.
+        """
+        for j in range(self.k - 1, 0, -1):
+            new = [p + (symbol,) for p in state[j - 1]]
+            self.add_subsequences(state, [p for p in new if p not in state[j]], j)
+
+    def product_state(self, state):
+        """Turns the scanner state into a hashable state of the compiled
+        automaton: the subsequences seen so far, of lengths 1 to k-1."""
+        return tuple(frozenset(i) for i in state[1 : self.k])
+
+    def product_step(self, seen, symbol):
+        """Computes a transition of the compiled automaton.
+
+        Arguments:
+            seen (tuple): the state, see `product_state`;
+            symbol (str): the symbol to be read.
+        Returns:
+            tuple: the next state, None if a forbidden subsequence is
+                completed.
+        """
+        state = self.scanner_state()
+        for j, new in enumerate(seen, 1):
+            self.add_subsequences(state, new, j)
+        if not self.completes_allowed(state, symbol):
+            return None
+        self.advance(state, symbol)
+        return self.product_state(state)
+
+    def automaton_start(self):
+        """Returns the initial state of the automaton recognizing the
+        language, see `product_state`."""
+        return self.product_state(self.scanner_state())
+
+    def automaton_step(self, state, symbol):
+        """Reads the symbol from the given state, see `product_step`."""
+        return self.product_step(state, symbol)
+
+    def automaton_final(self, state):
+        """Every prefix of a well-formed SP string is well-formed."""
+        return True
+
+    def next_symbols(self, state):
+        """Lists the symbols that can be read from the given scanner state
+        without completing a forbidden subsequence.
+
+        Arguments:
+            state (list): the scanner state, see `scanner_state`.
+        Returns:
+            list: the symbols that can be read next.
+        """
+        return [i for i in self.alphabet if self.completes_allowed(state, i)]
 
     def generate_item(self):
-        """Generates a well-formed string.
+        """Generates a well-formed string. The scanner state is carried
+        along the generated prefix, so only the next symbol is checked at
+        every step.
 
         Returns:
             str: the generated string.
@@ -142,20 +304,19 @@ class SP(L):
         if not self.alphabet:
             raise ValueError("The alphabet must be provided.")
 
+        state = self.scanner_state()
         string = ""
         while True:
-            options = []
-            for i in self.alphabet:
-                if self.scan(string + i):
-                    options.append(i)
-
-            add = choice(options + ["EOS"])
+            add = choice(self.next_symbols(state) + ["EOS"])
             if add == "EOS":
                 return string
             else:
+                self.advance(state, add)
                 string += add
 
-    def generate_sample(self, n=10, repeat=False, safe=True):
+    def generate_sample(
+        self, n=10, repeat=False, safe=True, exhaustive=False, max_length=None
+    ):
         """Generates data sample of desired length.
 
         Arguments:
@@ -167,9 +328,17 @@ class SP(L):
                 for example, when the grammar cannot generate the
                 required number of data items, and the repetitions
                 are set to False.
+            exhaustive (bool): if True and the repetitions are
+                prohibited, the n shortest well-formed strings are
+                listed instead of being sampled, see `enumerate_strings`;
+            max_length (int): the longest strings listed if
+                `exhaustive` is True, no limit if None.
         Returns:
             list: a list of generated examples.
         """
+        if exhaustive and not repeat:
+            return self.enumerate_sample(n, max_length)
+
         sample = [self.generate_item() for i in range(n)]
 
         if not repeat:
@@ -183,6 +352,7 @@ class SP(L):
                     useless_loops += 1
                 else:
                     useless_loops = 0
+                prev_len = len(sample)
 
                 if safe and useless_loops > 100:
                     print(
@@ -214,3 +384,19 @@ class SP(L):
         them.
         """
         self.grammar = list(set(self.grammar))
+
+
+def _data_subsequences(k, data):
+    """Collects k-long subsequences of all the given strings.
+
+    Arguments:
+        k (int): length of the subsequences;
+        data (list): input strings.
+    Returns:
+        set: subsequences found in the data.
+    """
+    sp = SP(k=k)
+    found = set()
+    for i in data:
+        found.update(sp.subsequences(i))
+    return found
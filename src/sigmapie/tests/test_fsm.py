@@ -93,6 +93,33 @@ class TestFSM(unittest.TestCase):
         self.assertFalse(f.scan_sl(">>ba<<"))
         self.assertFalse(f.scan_sl(">>ababbab<<"))
 
+    def test_compile_sl(self):
+        """Checks that the compiled SL table is built from the transitions
+        and rebuilt when the transitions are replaced."""
+        f = FSM(initial=">", final="<")
+        f.sl_to_fsm([(">", "a"), ("a", "b"), ("a", "a"), ("b", "<")])
+        self.assertTrue(f.table == {(">",): {"a"}, ("a",): {"a", "b"}, ("b",): {"<"}})
+        self.assertTrue(f.scan_sl(">aab<"))
+
+        f.transitions = [((">",), "b", ("b",)), (("b",), "<", ("<",))]
+        self.assertTrue(f.table is None)
+        self.assertTrue(f.scan_sl(">b<"))
+        self.assertFalse(f.scan_sl(">aab<"))
+
+    def test_sp_template(self):
+        """Checks that an SP template keeps the transitions taken by the
+        subsequences and scans strings through its index."""
+        f = FSM(initial=None, final=None)
+        f.sp_build_template(("a",), ["a", "b"], 2)
+        f.sp_fill_template(("b",))
+        f.sp_fill_template(("a", "b"))
+        f.sp_clean_template()
+
+        self.assertTrue(f.transitions == [[0, "a", 1], [0, "b", 0], [1, "b", 1]])
+        self.assertTrue(f.index[(1, "b")] == [1, "b", 1])
+        self.assertTrue(f.scan_sp("bbabb"))
+        self.assertFalse(f.scan_sp("aa"))
+
     def test_trim_fsm_2(self):
         f = FSM(initial=">", final="<")
         f.transitions = [
@@ -136,6 +163,21 @@ class TestFSM(unittest.TestCase):
         f.trim_fsm()
         self.assertTrue(set(f.transitions) == goal)
 
+    def test_trim_fsm_joined_paths(self):
+        """Checks that a state reached by several transitions is only
+        visited once."""
+        f = FSM(initial=">", final="<")
+        f.sl_to_fsm([(">", "a"), (">", "b"), ("a", "c"), ("b", "c"), ("c", "<"), ("d", "c")])
+        f.trim_fsm()
+        goal = [
+            ((">",), "a", ("a",)),
+            ((">",), "b", ("b",)),
+            (("a",), "c", ("c",)),
+            (("b",), "c", ("c",)),
+            (("c",), "<", ("<",)),
+        ]
+        self.assertTrue(sorted(f.transitions) == goal)
+
 
 if __name__ == "__main__":
     unittest.main()
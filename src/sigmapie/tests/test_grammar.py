@@ -14,7 +14,7 @@ import sys, os
 sys.path.insert(0, os.path.join(os.path.abspath(".."), ""))
 
 import unittest
-from grammar import L
+from grammar import L, SymbolTable, Complement, NgramSet
 
 
 class TestGeneralLanguages(unittest.TestCase):
@@ -77,6 +77,15 @@ class TestGeneralLanguages(unittest.TestCase):
         }
         self.assertTrue(set(ngrams) == ng)
 
+    def test_ngram_gen_3(self):
+        """Checks that only well-formed trigrams are generated, without
+        repetitions, and that their number is counted correctly."""
+        l = L(alphabet=["a", "b"], k=3)
+        ngrams = list(l.generate_all_ngrams(l.alphabet, l.k))
+        self.assertTrue(len(ngrams) == len(set(ngrams)))
+        self.assertTrue(all(l.well_formed_ngram(i) for i in ngrams))
+        self.assertTrue(len(ngrams) == l.count_all_ngrams(l.alphabet, l.k) == 24)
+
     def test_switch_same_alpha(self):
         """Checks if the generated grammar is correct when all alphabet symbols
         are used in the grammar, also checks that polarity was changed."""
@@ -104,6 +113,77 @@ class TestGeneralLanguages(unittest.TestCase):
         self.assertTrue(set(l.opposite_polarity(l.alphabet)) == g_opp)
         self.assertFalse(old_polarity == l.check_polarity)
 
+    def test_symbol_table(self):
+        """Checks that ngrams are packed into integers and unpacked back, and
+        that the edge symbols are interned together with the alphabet."""
+        l = L(alphabet=["a", "b"])
+        table = l.symbol_table()
+        self.assertTrue(table.symbols == ["a", "b", ">", "<"])
+        self.assertTrue(table.encode((">", "a", "b")) == 2 * 16 + 0 * 4 + 1)
+        self.assertTrue(table.decode(table.encode((">", "a", "b")), 3) == (">", "a", "b"))
+        self.assertTrue(table.encode(("a", "c")) is None)
+        self.assertTrue(table.encode_all([("a", "c"), ("b", "<")]) == {7})
+        self.assertTrue(l.symbol_table() is table)
+
+        l.alphabet = ["a", "b", "c"]
+        self.assertTrue("c" in l.symbol_table())
+
+    def test_complement(self):
+        """Checks that the virtual opposite grammar answers membership,
+        iteration and length like the materialized one."""
+        g = [(">", "b"), ("b", "<"), (">", "<"), ("a", "c")]
+        l = L(grammar=g, alphabet=["a", "b"])
+        c = l.complement(l.alphabet)
+        g_opp = {(">", "a"), ("a", "<"), ("a", "a"), ("b", "a"), ("a", "b"), ("b", "b")}
+
+        self.assertTrue(isinstance(c, Complement))
+        self.assertTrue(set(c) == g_opp)
+        self.assertTrue(len(c) == len(g_opp))
+        self.assertTrue(("a", "b") in c)
+        self.assertFalse((">", "b") in c)
+        self.assertFalse(("a", ">") in c)
+        self.assertFalse(("a", "c") in c)
+
+        l.grammar = c
+        self.assertTrue(l.complement(l.alphabet) is g)
+
+    def test_ngram_set(self):
+        """Checks the set-like behaviour of the bitset grammar storage."""
+        table = SymbolTable(["a", "b", ">", "<"])
+        s = NgramSet(table, 2, [(">", "a"), ("a", "b"), ("a", "b")])
+        self.assertTrue(len(s) == 2)
+        self.assertTrue(("a", "b") in s)
+        self.assertFalse(("b", "a") in s)
+        self.assertFalse(("a", "c") in s)
+        self.assertFalse(("a", "b", "a") in s)
+        self.assertTrue(s == {(">", "a"), ("a", "b")})
+
+        s.discard(("a", "b"))
+        s.add(("b", "<"))
+        self.assertTrue(set(s) == {(">", "a"), ("b", "<")})
+        self.assertRaises(ValueError, s.add, ("a", "c"))
+
+    def test_grammar_index(self):
+        """Checks that the indexed grammar is rebuilt when the grammar
+        changes."""
+        l = L(grammar=[(">", "a"), ("a", "<")], alphabet=["a"])
+        index = l.grammar_index(l.alphabet)
+        self.assertTrue(l.grammar_index(l.alphabet) is index)
+        self.assertTrue(("a", "<") in index)
+
+        l.grammar = [(">", "<")]
+        self.assertFalse(("a", "<") in l.grammar_index(l.alphabet))
+
+        l.grammar[0] = (">", "a")
+        l.invalidate()
+        self.assertTrue((">", "a") in l.grammar_index(l.alphabet))
+
+    def test_enumerate_strings(self):
+        """Checks that a general grammar is enumerated as a local one."""
+        l = L(alphabet=["a", "b"], grammar=[(">", "a"), ("a", "b"), ("b", "<"), (">", "<")])
+        self.assertTrue(list(l.enumerate_strings()) == ["", "ab"])
+        self.assertTrue(l.sample_length(2, 2, seed=1) == ["ab", "ab"])
+
     def test_change_polarity(self):
         """Tests the correctness of change_polarity."""
         a = L(polar="n")
@@ -268,6 +268,81 @@ class TestMTSLLanguages(unittest.TestCase):
         for s in ["aoap", "popa", "pbapop", "pabp", "popoa"]:
             self.assertFalse(d.scan(s))
 
+    def test_scan_updated_grammar(self):
+        """Tests that the scanner follows changes of the restrictions once
+        the grammar is invalidated."""
+        d = MTSL(polar="n")
+        d.alphabet = ["a", "o", "p"]
+        d.grammar = {("a", "o"): [("a", "a")], ("p",): [("p", "p")]}
+        self.assertTrue(d.scan("apoa"))
+        self.assertFalse(d.scan("apop"))
+        d.grammar[("a", "o")].append(("o", "a"))
+        d.invalidate()
+        self.assertFalse(d.scan("apoa"))
+
+    def test_generate_sample(self):
+        """Tests that the generated strings are well-formed."""
+        d = MTSL(polar="n")
+        d.alphabet = ["a", "o", "p"]
+        d.grammar = {("a", "o"): [("a", "o"), ("o", "a")], ("p",): [("p", "p")]}
+        d.fsmize()
+        sample = d.generate_sample(n=50)
+        self.assertTrue(len(sample) == 50)
+        self.assertTrue(all(d.scan(i) for i in sample))
+
+    def test_generate_item_gives_up(self):
+        """Tests that generation stops if no string is well-formed."""
+        d = MTSL(polar="n")
+        d.alphabet = ["a"]
+        d.grammar = {("a",): [(">", "a"), (">", "<")]}
+        d.fsmize()
+        tier_smap = {("a",): {(">",): ["a", "<"], ("a",): ["a", "<"]}}
+        self.assertRaises(ValueError, d.generate_item, tier_smap)
+
+    def test_paths(self):
+        """Tests that paths are found once, with the symbols in-between."""
+        d = MTSL()
+        d.alphabet = ["a", "b"]
+        goal = [
+            [">", set(), "a"],
+            [">", {"a"}, "b"],
+            [">", {"a", "b"}, "<"],
+            ["a", set(), "b"],
+            ["a", {"b"}, "<"],
+            ["b", set(), "<"],
+        ]
+        self.assertTrue(d.path("ab") == goal)
+        self.assertTrue(d.all_paths(["ab", "ab", ""]) == goal + [[">", set(), "<"]])
+
+    def test_grammar_learning_parallel(self):
+        """Tests that the grammar learned in several processes is the same."""
+        data = ["aapaap", "obob", "oopp", "aabb", "ob", "ap", "aaa", "bbb", ""]
+        a = MTSL(polar="n")
+        a.data = data[:]
+        a.extract_alphabet()
+        a.learn()
+        b = MTSL(polar="n")
+        b.data = data[:]
+        b.extract_alphabet()
+        b.learn(workers=2)
+        self.assertTrue(a.grammar == b.grammar)
+
+    def test_enumerate_strings(self):
+        """Tests that enumeration lists every well-formed string up to the
+        length bound, shortest first."""
+        d = MTSL(polar="n")
+        d.alphabet = ["a", "o", "p"]
+        d.grammar = {("a", "o"): [("a", "o"), ("o", "a")], ("p",): [("p", "p")]}
+        strings = list(d.enumerate_strings(max_length=3))
+        goal = [
+            "".join(i)
+            for n in range(4)
+            for i in product(d.alphabet, repeat=n)
+            if d.scan("".join(i))
+        ]
+        self.assertTrue(strings == goal)
+        self.assertTrue(d.generate_sample(n=5, repeat=False, exhaustive=True) == goal[:5])
+
 
 if __name__ == "__main__":
     unittest.main()
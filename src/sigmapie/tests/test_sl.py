@@ -42,6 +42,21 @@ class TestSLLanguages(unittest.TestCase):
         self.assertTrue(sln.scan("aaaaa"))
         self.assertTrue(sln.scan(""))
 
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_scan_many(self):
+        """Checks that batch scanning agrees with scanning string by string
+        for both polarities."""
+        strings = ["abab", "ab", "abb", "a", "", "ba", "abc"]
+        slp = SL()
+        slp.grammar = [(">", "a"), ("b", "a"), ("a", "b"), ("b", "<")]
+        slp.alphabet = ["a", "b"]
+        self.assertTrue(list(slp.scan_many(strings)) == [slp.scan(s) for s in strings])
+
+        sln = SL(polar="n", k=3)
+        sln.grammar = [("b", "a", "b"), (">", ">", "<")]
+        sln.alphabet = ["a", "b"]
+        self.assertTrue(list(sln.scan_many(strings)) == [sln.scan(s) for s in strings])
+
     def test_ngramize_2(self):
         """Checks if ngramize() correctly constructs bigrams."""
         sl = SL()
@@ -70,6 +85,16 @@ class TestSLLanguages(unittest.TestCase):
         }
         self.assertTrue(ngrams == goal)
 
+    def test_ngramize_data_windows(self):
+        """Checks that n-grams of several sizes are the same as the ones
+        constructed separately for every size."""
+        sl = SL()
+        sl.data = ["aaa", "bbb", "ab", ""]
+        windows = sl.ngramize_data_windows([1, 2, 3])
+        for k in [1, 2, 3]:
+            sl.k = k
+            self.assertTrue(windows[k] == set(sl.ngramize_data()))
+
     def test_learn(self):
         """Checks if positive and negative grammars are learned correctly."""
         data = ["abab", "ababab"]
@@ -124,6 +149,59 @@ class TestSLLanguages(unittest.TestCase):
         self.assertTrue(all([sl.scan(i) for i in sample]))
         self.assertTrue(len(sample) == 10)
 
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_generate_bulk(self):
+        """Checks that bulk generation gives well-formed strings within the
+        length limits, and the same sample for the same seed."""
+        sl = SL()
+        sl.alphabet = ["a", "b"]
+        sl.grammar = [(">", "a"), ("b", "a"), ("a", "b"), ("b", "<")]
+        sl.fsmize()
+
+        sample = sl.generate_bulk(n=100, seed=3, min_length=4, max_length=8)
+        self.assertTrue(len(sample) == 100)
+        self.assertTrue(all([sl.scan(i) and 4 <= len(i) <= 8 for i in sample]))
+        self.assertTrue(sl.generate_bulk(n=100, seed=3, min_length=4, max_length=8) == sample)
+
+    def test_enumerate_strings(self):
+        """Checks that enumeration lists the distinct well-formed strings in
+        the order of their length, and stops at the length bound."""
+        sl = SL()
+        sl.alphabet = ["a", "b"]
+        sl.grammar = [(">", "a"), ("b", "a"), ("a", "b"), ("b", "<")]
+
+        self.assertTrue(list(sl.enumerate_strings(6)) == ["ab", "abab", "ababab"])
+        sample = sl.generate_sample(n=2, repeat=False, exhaustive=True)
+        self.assertTrue(sample == ["ab", "abab"])
+
+    def test_sample_length(self):
+        """Checks that strings of the requested length are drawn, and that
+        every such string can be drawn."""
+        sl = SL(polar="n")
+        sl.alphabet = ["a", "b", "c"]
+        sl.grammar = [("a", "b"), ("c", "c"), (">", "b")]
+
+        goal = {i for i in sl.enumerate_strings(4) if len(i) == 4}
+        sample = sl.sample_length(n=1000, length=4, seed=7)
+        self.assertTrue(set(sample) == goal)
+        self.assertTrue(sl.sample_length(n=1000, length=4, seed=7) == sample)
+
+    def test_state_map(self):
+        """Checks that the state map is keyed by tuples, and rebuilt when
+        the grammar changes."""
+        sl = SL()
+        sl.alphabet = ["a", "b"]
+        sl.grammar = [(">", "a"), ("b", "a"), ("a", "b"), ("b", "<")]
+        sl.fsmize()
+
+        smap = sl.state_map()
+        self.assertTrue(smap == {(">",): ["a"], ("b",): ["a", "<"], ("a",): ["b"]})
+        self.assertTrue(sl.state_map() is smap)
+
+        sl.grammar = [(">", "a"), ("a", "<")]
+        sl.fsmize()
+        self.assertTrue(sl.state_map() == {(">",): ["a"], ("a",): ["<"]})
+
     def test_switch_polarity(self):
         """Makes sure that switch_polarity actually switches the grammar to the
         opposite, and that switching it again will result in the original
@@ -136,6 +214,7 @@ class TestSLLanguages(unittest.TestCase):
 
         sl.switch_polarity()
         self.assertTrue(set(sl.grammar) == gpos)
+        self.assertTrue(isinstance(sl.grammar, list))
         self.assertTrue(sl.check_polarity() == "p")
 
         sl.switch_polarity()
@@ -56,6 +56,15 @@ class TestSPLanguages(unittest.TestCase):
         self.assertTrue(set(sp.subsequences(str1)) == ssq1)
         self.assertTrue(set(sp.subsequences(str2)) == ssq2)
 
+    def test_subsequences_long(self):
+        """Tests extraction of subsequences from a long word with many
+        repeated symbols."""
+        word = "abcab" * 8
+        sp = SP(k=3)
+        goal = {(x, y, z) for x in "abc" for y in "abc" for z in "abc"}
+        self.assertTrue(set(sp.subsequences(word)) == goal)
+        self.assertTrue(set(sp.subsequences("aab")) == {("a", "a", "b")})
+
     def test_learn_pos(self):
         """Tests learning of the positive grammar."""
         data = ["abab", "abcde"]
@@ -84,6 +93,18 @@ class TestSPLanguages(unittest.TestCase):
         sp.learn()
         self.assertTrue(set(sp.grammar) == goal)
 
+    def test_learn_parallel(self):
+        """Tests that learning split between processes gives the same
+        grammar as learning in one process."""
+        sp = SP(k=3)
+        sp.data = ["abab", "abcde", "edcba", "aab", "ccd"]
+        sp.extract_alphabet()
+        sp.learn()
+        serial = set(sp.grammar)
+        sp.learn(workers=2)
+        self.assertTrue(set(sp.grammar) == serial)
+        self.assertTrue(len(sp.grammar) == len(serial))
+
     def test_learn_neg(self):
         """Tests learning of the negative grammar."""
         data = ["aaaaabbbb", "abbbb", "aaab"]
@@ -136,6 +157,58 @@ class TestSPLanguages(unittest.TestCase):
         self.assertFalse(sp.scan("abababba"))
         self.assertFalse(sp.scan("abbbbabbaababab"))
 
+    def test_scan_pos(self):
+        """Tests if a positive grammar accepts only strings whose
+        subsequences are all in the grammar."""
+        sp = SP()
+        sp.grammar = [tuple(i) for i in ["ab", "ba", "bb"]]
+        sp.extract_alphabet()
+
+        self.assertTrue(sp.scan(""))
+        self.assertTrue(sp.scan("a"))
+        self.assertTrue(sp.scan("bbabb"))
+        self.assertFalse(sp.scan("aa"))
+        self.assertFalse(sp.scan("babba"))
+
+    def test_enumerate_unbounded(self):
+        """Tests that the shortest strings are listed without exploring
+        the whole automaton first."""
+        s = SP(k=3, polar="n")
+        s.alphabet = ["a", "b", "c", "d", "e", "f"]
+        s.grammar = [("a", "b", "a")]
+        sample = s.generate_sample(n=8, repeat=False, exhaustive=True)
+        self.assertTrue(sample == ["", "a", "b", "c", "d", "e", "f", "aa"])
+
+    def test_fsmize_compiled(self):
+        """Tests that the compiled automaton accepts the same strings as
+        the scanner, and reuses the transitions it has created."""
+        sp = SP(polar="n", k=3)
+        sp.grammar = [tuple("aba"), tuple("bbb")]
+        sp.alphabet = ["a", "b"]
+        strings = ["", "ab", "aab", "abba", "baab", "babb", "bbab", "aaaa"]
+        expected = [sp.scan(i) for i in strings]
+
+        sp.fsmize(compiled=True)
+        self.assertTrue(sp.fsm.family == [])
+        self.assertTrue([sp.scan(i) for i in strings] == expected)
+        self.assertTrue([sp.fsm.run_all_fsm(i) for i in strings] == expected)
+        size = len(sp.fsm.compiled.transitions)
+        sp.scan("abba")
+        self.assertTrue(len(sp.fsm.compiled.transitions) == size)
+
+    def test_next_symbols(self):
+        """Tests that the scanner state carried along a prefix tells which
+        symbols can follow it."""
+        sp = SP(polar="n", k=3)
+        sp.grammar = [tuple("aba")]
+        sp.alphabet = ["a", "b"]
+
+        state = sp.scanner_state()
+        for s in "bab":
+            self.assertTrue(s in sp.next_symbols(state))
+            sp.advance(state, s)
+        self.assertTrue(sp.next_symbols(state) == ["b"])
+
     def test_generate_item(self):
         """Tests string generation."""
         sp = SP(polar="n")
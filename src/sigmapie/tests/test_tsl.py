@@ -43,11 +43,37 @@ class TestTSLLanguages(unittest.TestCase):
         tsl.learn_tier()
         self.assertTrue(set(tsl.tier) == {"x", "y"})
 
+    def test_tier_learning_parallel(self):
+        """Checks that the tier learned in several processes is the same."""
+        b = TSL()
+        b.data = ["ccaccaccbc", "acbbaababc", "ababbab"]
+        b.alphabet = ["a", "b", "c"]
+        b.learn_tier(workers=2)
+        self.assertTrue(set(b.tier) == {"a", "b"})
+
+        self.assertTrue(b.test_insert("c", set(b.ngramize_data()), set()))
+
     def test_tier_image(self):
         """Tests the erasing function."""
         a = TSL()
         a.tier = ["a"]
         self.assertTrue(a.tier_image("cvamda") == "aa")
+        self.assertTrue(a.tier_image(("c", "a", "a")) == "aa")
+        self.assertTrue(a.tier_image(["a", "m"]) == "a")
+
+    def test_tier_image_cached(self):
+        """Tests that cached tier images are the same and that only the
+        most recent ones are kept."""
+        a = TSL()
+        a.tier = ["a", "m"]
+        a.cache_projections(size=2)
+        for s in ["cvamda", "mama", "cvamda", "dd"]:
+            self.assertTrue(a.tier_image(s) == "".join(i for i in s if i in a.tier))
+        self.assertTrue(list(a.projection_cache) == [(("a", "m"), "cvamda"), (("a", "m"), "dd")])
+
+        a.cache_projections(None)
+        self.assertTrue(a.projection_cache is None)
+        self.assertTrue(a.tier_image("mxa") == "ma")
 
     def test_learn_pos(self):
         """Tests learning of the positive TSL grammar."""
@@ -161,6 +187,16 @@ class TestTSLLanguages(unittest.TestCase):
         self.assertFalse(a.scan("okakok"))
         self.assertFalse(a.scan("kakokak"))
 
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_scan_many(self):
+        """Checks that batch scanning agrees with scanning string by string."""
+        a = TSL(polar="n")
+        a.grammar = [("a", "o"), ("o", "a")]
+        a.tier = ["a", "o"]
+        a.alphabet = ["a", "o", "k"]
+        strings = ["akak", "okak", "kkk", "", "okkokk", "aka"]
+        self.assertTrue(list(a.scan_many(strings)) == [a.scan(s) for s in strings])
+
     def test_generate_item_pos(self):
         """Tests that the generated items are grammatical."""
         a = TSL(polar="p")
@@ -185,6 +221,14 @@ class TestTSLLanguages(unittest.TestCase):
         for i in gen_items:
             self.assertTrue(a.scan(i))
 
+    def test_state_map(self):
+        """Tests that the state map is keyed by strings of tier symbols."""
+        a = TSL(polar="p", tier=["a", "o"])
+        a.alphabet = ["a", "o", "k"]
+        a.grammar = [(">", "a"), ("a", "a"), ("a", "<"), (">", "<")]
+        a.fsmize()
+        self.assertTrue(a.state_map() == {">": ["a", "<"], "a": ["a", "<"]})
+
     def test_generate_item_neg(self):
         """Tests that the generated items are grammatical."""
         a = TSL(polar="n")
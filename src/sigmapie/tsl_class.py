@@ -8,6 +8,8 @@ option) any later version.
 """
 
 from random import choice, randint
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from sigmapie.sl_class import *
 
 
@@ -40,38 +42,71 @@ class TSL(SL):
         self.tier = tier
         self.fsm = FSM(initial=self.edges[0], final=self.edges[1])
 
-    def learn(self):
+    @property
+    def tier(self):
+        return self._tier
+
+    @tier.setter
+    def tier(self, value):
+        self._tier = value
+        self.invalidate()
+
+    def learn(self, workers=None):
         """Learns tier and finds attested (if positive) or unattested (if
-        negative) ngrams of the tier images of the data."""
+        negative) ngrams of the tier images of the data.
+
+        Arguments:
+            workers (int) (optional): number of processes the tier
+                symbols are tested in, see `learn_tier`.
+        """
         if not self.alphabet:
             raise ValueError("Alphabet cannot be empty.")
         if not self.data:
             raise ValueError("Data needs to be provided.")
 
-        self.learn_tier()
+        self.learn_tier(workers)
         tier_sequences = [self.tier_image(i) for i in self.data]
         self.grammar = TSL(k=self.k, data=tier_sequences).ngramize_data()
 
         if self.check_polarity() == "n":
             self.grammar = self.opposite_polarity(self.tier)
 
-    def learn_tier(self):
+    def learn_tier(self, workers=None):
         """This function determines which of the symbols used in the language
         are tier symbols, algorithm by Jardine & McMullin (2017).
 
+        The ngram sets are built once, and the (n+1)-grams are indexed
+        by the symbols they contain, so every symbol is only tested
+        against the (n+1)-grams it occurs in.
+        Arguments:
+            workers (int) (optional): number of processes the symbols
+                are split between. By default, everything is done in
+                the current process.
         Updates tier attribute.
         """
-        self.tier = self.alphabet[:]
-        ngrams = self.ngramize_data()
-
-        ngrams_less = TSL(data=self.data, k=(self.k - 1)).ngramize_data()
-        ngrams_more = TSL(data=self.data, k=(self.k + 1)).ngramize_data()
+        windows = self.ngramize_data_windows([self.k - 1, self.k, self.k + 1])
+        ngrams = windows[self.k]
+        ngrams_less = windows[self.k - 1]
+
+        containing = {symbol: [] for symbol in self.alphabet}
+        for big in windows[self.k + 1]:
+            for symbol in set(big):
+                if symbol in containing:
+                    containing[symbol].append(big)
+        tasks = list(containing.items())
+
+        # the tests only need the locality and the edges, so the data
+        # is not sent to the worker processes
+        tester = type(self)(k=self.k, edges=self.edges)
+        test = partial(_tier_symbol_test, tester, ngrams, ngrams_less)
+        if workers is None or workers < 2:
+            removed = list(map(test, tasks))
+        else:
+            chunk = -(-len(tasks) // workers)
+            with ProcessPoolExecutor(workers) as pool:
+                removed = list(pool.map(test, tasks, chunksize=max(chunk, 1)))
 
-        for symbol in self.alphabet:
-            if self.test_insert(symbol, ngrams, ngrams_less) and self.test_remove(
-                symbol, ngrams, ngrams_more
-            ):
-                self.tier.remove(symbol)
+        self.tier = [s for s, r in zip(self.alphabet, removed) if not r]
 
     def test_insert(self, symbol, ngrams, ngrams_less):
         """Tier presense test #1.
@@ -81,24 +116,27 @@ class TSL(SL):
         ('x','y','S','z').
         Arguments:
             symbol (str): the symbol that is currently being tested;
-            ngrams (list): the list of n-gramized input;
-            ngrams_less (list): the list of (n-1)-gramized input.
+            ngrams (list or set): the n-gramized input;
+            ngrams_less (list or set): the (n-1)-gramized input.
         Returns:
             bool: True if a symbol passed the test, otherwise False.
         """
-        extension = []
-        for small in ngrams_less:
-            for i in range(len(small) + 1):
-                new = small[:i] + (symbol,) + small[i:]
-                if self.well_formed_ngram(new):
-                    extension.append(new)
+        if not isinstance(ngrams, (set, frozenset)):
+            ngrams = set(ngrams)
 
         # needs to be here: otherwise no local WF/WE processes
         edgecase1 = tuple(self.edges[0] * (self.k - 1) + symbol)
         edgecase2 = tuple(symbol + self.edges[1] * (self.k - 1))
-        extension.extend([edgecase1, edgecase2])
+        if edgecase1 not in ngrams or edgecase2 not in ngrams:
+            return False
 
-        return set(extension).issubset(set(ngrams))
+        for small in ngrams_less:
+            for i in range(len(small) + 1):
+                new = small[:i] + (symbol,) + small[i:]
+                if new not in ngrams and self.well_formed_ngram(new):
+                    return False
+
+        return True
 
     def test_remove(self, symbol, ngrams, ngrams_more):
         """Tier presense test #2.
@@ -107,21 +145,24 @@ class TSL(SL):
         ('x','S','y'), there must be an n-gram of the type ('x', 'y').
         Arguments:
             symbol (str): the symbol that is currently being tested;
-            ngrams (list): the list of n-gramized input;
-            ngrams_more (list): the list of (n+1)-gramized input.
+            ngrams (list or set): the n-gramized input;
+            ngrams_more (list or set): the (n+1)-gramized input, it
+                is enough to give the ones that contain the symbol.
         Returns:
             bool: True if a symbol passed the test, otherwise False.
         """
-        extension = []
+        if not isinstance(ngrams, (set, frozenset)):
+            ngrams = set(ngrams)
+
         for big in ngrams_more:
             if symbol in big:
                 for i in range(len(big)):
                     if big[i] == symbol:
                         new = big[:i] + big[i + 1 :]
-                        if self.well_formed_ngram(new):
-                            extension.append(new)
+                        if new not in ngrams and self.well_formed_ngram(new):
+                            return False
 
-        return set(extension).issubset(set(ngrams))
+        return True
 
     def tier_image(self, string):
         """Function that returns a tier image of the input string.
@@ -131,7 +172,7 @@ class TSL(SL):
         Returns:
             str: tier image of the input string.
         """
-        return "".join(i for i in string if i in self.tier)
+        return self.tier_projection(string, self.tier)
 
     def fsmize(self):
         """Builds FSM corresponding to the given grammar and saves in it the
@@ -147,8 +188,7 @@ class TSL(SL):
         if self.check_polarity() == "p":
             self.fsm.sl_to_fsm(self.grammar)
         else:
-            opposite = self.opposite_polarity(self.tier)
-            self.fsm.sl_to_fsm(opposite)
+            self.fsm.sl_to_fsm(self.complement(self.tier))
 
     def switch_polarity(self):
         """Changes polarity of the grammar, and rewrites grammar to the
@@ -162,7 +202,9 @@ class TSL(SL):
         self.grammar = self.opposite_polarity(self.tier)
         self.change_polarity()
 
-    def generate_sample(self, n=10, repeat=True, safe=True):
+    def generate_sample(
+        self, n=10, repeat=True, safe=True, exhaustive=False, max_length=None
+    ):
         """Generates n well-formed strings, with or without repetitions.
 
         Arguments:
@@ -173,6 +215,11 @@ class TSL(SL):
                 for example, when the grammar cannot generate the
                 required number of data items, and the repetitions
                 are set to False.
+            exhaustive (bool): if True and the repetitions are
+                prohibited, the n shortest well-formed strings are
+                listed instead of being sampled, see `enumerate_strings`;
+            max_length (int): the longest strings listed if
+                `exhaustive` is True, no limit if None.
         Returns:
             list: generated data sample.
         """
@@ -184,6 +231,9 @@ class TSL(SL):
                 "is not extracted, use `grammar.learn()`."
             )
 
+        if exhaustive and not repeat:
+            return self.enumerate_sample(n, max_length)
+
         if len(self.alphabet) == len(self.tier):
             sl = SL(polar=self.check_polarity())
             sl.alphabet = self.alphabet
@@ -196,7 +246,6 @@ class TSL(SL):
         if not self.fsm.transitions:
             self.fsmize()
 
-        statemap = self.state_map()
         data = [self.generate_item() for i in range(n)]
 
         if not repeat:
@@ -209,6 +258,7 @@ class TSL(SL):
                     useless_loops += 1
                 else:
                     useless_loops = 0
+                prev_len = len(data)
 
                 if safe and useless_loops > 100:
                     print(
@@ -227,7 +277,7 @@ class TSL(SL):
         if not self.fsm.transitions:
             self.fsmize()
 
-        statemap = self.state_map()
+        statemap = self.tier_transitions()
         if not any([len(statemap[x]) for x in statemap]):
             raise (
                 ValueError(
@@ -270,22 +320,34 @@ class TSL(SL):
                 {"keys":[list of possible next symbols]}, where 
                 keys are (k-1)-long strings.
         """
+        return {"".join(i): j for i, j in self.tier_transitions().items()}
+
+    def tier_transitions(self):
+        """
+        Generates the dictionary of `state_map` with (k-1)-long tuples
+        of symbols as keys, the way `SL.generate_item` reads it. The
+        map is kept on the FSM until its transitions change, see
+        `FSM.state_map`.
+        Returns:
+            dict: the dictionary of the form
+                {(keys):[list of possible next symbols]}.
+        """
         if self.fsm is None:
             self.fsmize()
 
-        local_alphabet = self.tier[:] + self.edges[:]
-        poss = product(local_alphabet, repeat=(self.k - 1))
+        return self.fsm.state_map(self.tier + self.edges)
 
-        smap = {}
-        for i in poss:
-            for j in self.fsm.transitions:
-                if j[0] == i:
-                    before = "".join(i)
-                    if before in smap:
-                        smap[before] += j[1]
-                    else:
-                        smap[before] = [j[1]]
-        return smap
+    def allowed_ngram(self, ngram):
+        """Tells if the tier ngram is allowed by the grammar."""
+        index = self.grammar_index(self.tier)
+        return (ngram in index) == (self.check_polarity() == "p")
+
+    def automaton_step(self, state, symbol):
+        """Reads the symbol from the given state, see `L.automaton_step`;
+        the state only changes if the symbol is on the tier."""
+        if symbol not in self.tier:
+            return state
+        return super().automaton_step(state, symbol)
 
     def scan(self, string):
         """Checks if the given string is well-formed with respect to the given
@@ -297,9 +359,48 @@ class TSL(SL):
             bool: well-formedness value of a string.
         """
         tier_img = self.annotate_string(self.tier_image(string))
-        matches = [(n in self.grammar) for n in self.ngramize_item(tier_img)]
+        index = self.grammar_index(self.tier)
+        matches = ((n in index) for n in self.ngramize_item(tier_img))
 
         if self.check_polarity() == "p":
             return all(matches)
         else:
             return not any(matches)
+
+    def scan_many(self, strings):
+        """Checks well-formedness of a whole list of strings at once, see
+        `SL.scan_annotated_many`.
+
+        Arguments:
+            strings (list): the strings that need to be evaluated.
+        Returns:
+            numpy.ndarray: boolean vector of well-formedness values,
+                one per input string.
+        """
+        if not self.tier:
+            raise ValueError(
+                "The tier is not extracted or empty. "
+                "Switch to SL or use `grammar.learn()`."
+            )
+        annotated = [self.annotate_string(self.tier_image(s)) for s in strings]
+        return self.scan_annotated_many(annotated, self.tier)
+
+
+def _tier_symbol_test(tsl, ngrams, ngrams_less, task):
+    """Tells if a symbol passes both tier presence tests of
+    `TSL.learn_tier`, i.e. if it is not a tier symbol.
+
+    Arguments:
+        tsl (TSL): a grammar with the locality and the edges of the
+            one the tier is learned for;
+        ngrams (set): the n-gramized input;
+        ngrams_less (set): the (n-1)-gramized input;
+        task (tuple): the symbol and the list of (n+1)-grams
+            containing it.
+    Returns:
+        bool: True if the symbol is not a tier symbol.
+    """
+    symbol, ngrams_more = task
+    return tsl.test_insert(symbol, ngrams, ngrams_less) and tsl.test_remove(
+        symbol, ngrams, ngrams_more
+    )